@@ -0,0 +1,141 @@
+# Batch compilation: compiles many source files on a pool of worker
+# processes.  Every worker builds the parser once and then compiles the
+# files it is given one after the other; sources are memory-mapped (see
+# main.compile_file) and the C output is written with a single call, or
+# while the file is parsed with stream=True (see stream.py).
+#
+# With a cache directory (see cache.py) unchanged sources are not compiled
+# again: their C file is copied from the cache.  With a profile file the
+# profiles of all the compiles (see instrument.py) are added up and
+# written there as JSON.
+
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+import main
+from cache import DEFAULT_SIZE, Cache
+from instrument import Profile
+
+
+# the sources to compile: files are taken as they are, directories are
+# searched (recursively) for files ending with `suffix`.  Returns a list of
+# (source path, output path).
+def collect_sources(paths, suffix, output_dir=None):
+    jobs = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, dirs, files in os.walk(path):
+                dirs.sort()
+                for name in sorted(files):
+                    if name.endswith(suffix):
+                        source = os.path.join(root, name)
+                        relative = os.path.relpath(source, path)
+                        jobs.append((source, output_path(source, relative, output_dir)))
+        else:
+            jobs.append((path, output_path(path, os.path.basename(path), output_dir)))
+    return jobs
+
+
+# next to the source, or at the same relative place under output_dir
+def output_path(source, relative, output_dir):
+    if output_dir is None:
+        return os.path.splitext(source)[0] + '.c'
+    return os.path.join(output_dir, os.path.splitext(relative)[0] + '.c')
+
+
+def init_worker():
+    # build (or load) the tables once, before the first file
+    main.get_parser()
+
+
+# compiles one file, returns (source, output, seconds, error message or
+# None, whether the output came from the cache, the profile as a dict or
+# None)
+def compile_job(job, stream=False, cache_dir=None, profile=False, passes=()):
+    source, output = job
+    profile = Profile() if profile else None
+    start = time.perf_counter()
+    try:
+        directory = os.path.dirname(output)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        if cache_dir is not None:
+            cache = Cache(cache_dir)
+            with open(source, 'rb') as fp:
+                key = cache.key(fp.read(), {'ast_mode': 'none', 'stream': stream,
+                                            'passes': list(passes)})
+            if cache.get(key, output) is not None:
+                return source, output, time.perf_counter() - start, None, True, None
+        if stream:
+            result = main.compile_file(source, ast_mode='none', output=output, profile=profile)
+        else:
+            result = main.compile_file(source, ast_mode='none', profile=profile, passes=passes)
+            with open(output, 'w') as fp:
+                fp.write(result.c_text())
+        if cache_dir is not None:
+            cache.put(key, output, {'source': source,
+                                    'program_name': result.program_name,
+                                    'instructions': len(result.quadruples),
+                                    'temps': len(result.temp_var_names),
+                                    'seconds': time.perf_counter() - start})
+    except main.CompileError as e:
+        error = '; '.join(e.errors)
+    except Exception as e:
+        error = '%s: %s' % (type(e).__name__, e)
+    else:
+        error = None
+    return (source, output, time.perf_counter() - start, error, False,
+            None if profile is None else profile.as_dict())
+
+
+def compile_all(jobs, workers=None, stream=False, cache_dir=None, profile=False, passes=()):
+    if workers == 1 or len(jobs) <= 1:
+        return [compile_job(job, stream, cache_dir, profile, passes) for job in jobs]
+    workers = workers or os.cpu_count() or 1
+    # big chunks keep the pipes quiet when there are many small files
+    chunksize = max(1, len(jobs) // (workers * 16))
+    with ProcessPoolExecutor(workers, initializer=init_worker) as executor:
+        job = partial(compile_job, stream=stream, cache_dir=cache_dir, profile=profile,
+                      passes=passes)
+        return list(executor.map(job, jobs, chunksize=chunksize))
+
+
+# prints one line per file and a summary, returns the number of failures
+def report(results, elapsed, out=sys.stdout):
+    failures = 0
+    cached = 0
+    lines = []
+    for source, output, seconds, error, hit, profile in results:
+        if hit:
+            cached += 1
+            lines.append('cache %8.4fs  %s -> %s' % (seconds, source, output))
+        elif error is None:
+            lines.append('ok    %8.4fs  %s -> %s' % (seconds, source, output))
+        else:
+            failures += 1
+            lines.append('FAIL  %8.4fs  %s: %s' % (seconds, source, error))
+    total = sum(result[2] for result in results)
+    lines.append('%d files, %d failed, %d from the cache, %.3fs compiling, %.3fs wall clock'
+                 % (len(results), failures, cached, total, elapsed))
+    out.write('\n'.join(lines) + '\n')
+    return failures
+
+
+def run(paths, output_dir=None, workers=None, suffix='.txt', stream=False,
+        cache_dir=None, cache_size=DEFAULT_SIZE, profile_path=None, passes=()):
+    jobs = collect_sources(paths, suffix, output_dir)
+    start = time.perf_counter()
+    results = compile_all(jobs, workers, stream, cache_dir, profile_path is not None, passes)
+    if cache_dir is not None:
+        Cache(cache_dir, cache_size).evict()
+    if profile_path is not None:
+        profile = Profile()
+        for result in results:
+            if result[5] is not None:
+                profile.add(result[5])
+        with open(profile_path, 'w') as fp:
+            fp.write(profile.to_json() + '\n')
+    return report(results, time.perf_counter() - start)
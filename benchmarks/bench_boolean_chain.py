@@ -0,0 +1,40 @@
+# Times code generation for an `if` whose condition is a chain of n
+# relational tests joined by && or ||.  With O(1) merging of the
+# truelists/falselists the time per test should stay flat as n grows.
+#
+#   python benchmarks/bench_boolean_chain.py [max_terms]
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import main
+
+
+def chain_program(terms, op):
+    condition = (' %s ' % op).join('(a < %d)' % i for i in range(terms))
+    return 'program chain var a, b: int begin if %s then b := 1 else b := 2 end' % condition
+
+
+def time_chain(terms, op):
+    source = chain_program(terms, op)
+    start = time.perf_counter()
+    main.compile_source(source, ast_mode='none')
+    elapsed = time.perf_counter() - start
+    return elapsed
+
+
+def run(max_terms):
+    print('%-4s %8s %10s %14s' % ('op', 'terms', 'seconds', 'us per term'))
+    for op in ('&&', '||'):
+        terms = 1250
+        while terms <= max_terms:
+            elapsed = time_chain(terms, op)
+            print('%-4s %8d %10.4f %14.2f' % (op, terms, elapsed, elapsed / terms * 1e6))
+            terms *= 2
+
+
+if __name__ == '__main__':
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 20000)
@@ -0,0 +1,99 @@
+# Times building the control-flow graph of generated programs (see
+# generate.py) and the analyses of cfg.py on it, for growing programs, and
+# reports how the time of each grows with the number of blocks (the slope
+# of log(time) against log(blocks), 1 for linear).
+#
+#   cfg         the basic blocks and their edges
+#   dominators  the immediate dominators
+#   reaching    reaching definitions
+#   liveness    live names
+#   available   available expressions
+#
+#   python benchmarks/bench_dataflow.py [--sizes 1000 2000 4000 8000] [-o results.json]
+
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import cfg
+import main
+from bench_scaling import slope
+from generate import generate
+
+ANALYSES = ('cfg', 'dominators', 'reaching', 'liveness', 'available')
+
+
+def timed(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - start
+
+
+def measure(quadruples):
+    graph, cfg_time = timed(cfg.CFG, quadruples)
+    idom, dominators_time = timed(graph.dominators)
+    reaching, reaching_time = timed(cfg.reaching_definitions, quadruples, graph)
+    live, liveness_time = timed(cfg.liveness, quadruples, graph)
+    available, available_time = timed(cfg.available_expressions, quadruples, graph)
+    return {'instructions': len(quadruples),
+            'blocks': len(graph),
+            'definitions': len(reaching[0]),
+            'names': len(live[0]),
+            'expressions': len(available[0]),
+            'cfg': cfg_time,
+            'dominators': dominators_time,
+            'reaching': reaching_time,
+            'liveness': liveness_time,
+            'available': available_time}
+
+
+def run(sizes, shape, repeat=3):
+    main.get_parser()
+    results = []
+    print('%10s %8s %8s %10s %10s %10s %10s %10s' % ('statements', 'instrs', 'blocks', *ANALYSES))
+    for size in sizes:
+        quadruples = main.compile_source(generate(size, **shape), 'none', scanner=True).quadruples
+        best = None
+        for i in range(repeat):
+            timings = measure(quadruples)
+            if best is None:
+                best = timings
+            else:
+                for analysis in ANALYSES:
+                    best[analysis] = min(best[analysis], timings[analysis])
+        best['statements'] = size
+        results.append(best)
+        print('%10d %8d %8d %10.4f %10.4f %10.4f %10.4f %10.4f' % (
+            size, best['instructions'], best['blocks'],
+            *(best[analysis] for analysis in ANALYSES)))
+    slopes = {analysis: slope([r['blocks'] for r in results], [r[analysis] for r in results])
+              for analysis in ANALYSES}
+    print('growth: ' + ', '.join('%s %s' % (analysis, 'n/a' if slopes[analysis] is None
+                                            else '%.2f' % slopes[analysis])
+                                 for analysis in ANALYSES))
+    return {'shape': shape, 'repeat': repeat, 'results': results, 'slopes': slopes}
+
+
+if __name__ == '__main__':
+    arg_parser = argparse.ArgumentParser(description='Time the dataflow analyses across sizes.')
+    arg_parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 2000, 4000, 8000],
+                            help='numbers of statements')
+    arg_parser.add_argument('--depth', type=int, default=2)
+    arg_parser.add_argument('--chain', type=int, default=2)
+    arg_parser.add_argument('--expr-depth', type=int, default=2)
+    arg_parser.add_argument('--variables', type=int, default=8)
+    arg_parser.add_argument('--seed', type=int, default=0)
+    arg_parser.add_argument('--repeat', type=int, default=3)
+    arg_parser.add_argument('-o', '--output', help='write the results as JSON to this file')
+    args = arg_parser.parse_args()
+    shape = {'depth': args.depth, 'chain': args.chain, 'expr_depth': args.expr_depth,
+             'variables': args.variables, 'seed': args.seed}
+    report = run(args.sizes, shape, args.repeat)
+    if args.output:
+        with open(args.output, 'w') as fp:
+            json.dump(report, fp, indent=2)
+            fp.write('\n')
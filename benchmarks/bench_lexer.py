@@ -0,0 +1,118 @@
+# Tokens per second of the PLY lexer and of the hand-written scanner on a
+# few megabytes of random tokens.  Before timing, the two token streams
+# (type, value, lineno, lexpos) and their errors are compared, for str and
+# for bytes input to the scanner, and the benchmark stops if they differ.
+#
+#   python benchmarks/bench_lexer.py [megabytes]
+
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import main
+from scanner import Scanner, operators, reserved
+
+# words which start like a keyword but are identifiers
+NEAR_KEYWORDS = ['iffy', 'done_1', 'do2', 'ofs', 'ends', 'integer', 'reals', 'variable',
+                 '_begin', 'printer', 'thence', 'elsewhere', 'whiles', 'defaults']
+
+
+def random_source(size, seed=1):
+    rng = random.Random(seed)
+    keywords = list(reserved)
+    ops = list(operators)
+    pieces = []
+    length = 0
+    while length < size:
+        kind = rng.random()
+        if kind < 0.25:
+            piece = rng.choice(keywords)
+        elif kind < 0.35:
+            piece = rng.choice(NEAR_KEYWORDS)
+        elif kind < 0.55:
+            piece = 'v%d' % rng.randrange(1000)
+        elif kind < 0.65:
+            piece = str(rng.randrange(100000))
+        elif kind < 0.7:
+            piece = '%d.%d' % (rng.randrange(100), rng.randrange(100))
+        elif kind < 0.9999:
+            piece = rng.choice(ops)
+        else:
+            piece = '$'
+        pieces.append(piece)
+        pieces.append(rng.choice((' ', ' ', ' ', '\n', '\t', '  ', '')))
+        length += len(piece) + 1
+    return ''.join(pieces)
+
+
+class Errors:
+    def __init__(self):
+        self.errors = []
+
+
+def ply_tokens(text):
+    lexer = main.get_lexer().clone()
+    lexer.session = Errors()
+    lexer.input(text)
+    return list(iter(lexer.token, None)), lexer.session.errors
+
+
+def scanner_tokens(text):
+    scanner = Scanner()
+    scanner.session = Errors()
+    scanner.input(text)
+    return list(scanner), scanner.session.errors
+
+
+def token_tuples(toks):
+    return [(t.type, t.value, t.lineno, t.lexpos) for t in toks]
+
+
+# the differential check, returns a description of the first difference
+def compare(text):
+    ply, ply_errors = ply_tokens(text)
+    fast, fast_errors = scanner_tokens(text)
+    a = token_tuples(ply)
+    b = token_tuples(fast)
+    if a != b:
+        for i, (x, y) in enumerate(zip(a, b)):
+            if x != y:
+                return 'token %d: PLY %r, scanner %r' % (i, x, y)
+        return 'PLY has %d tokens, the scanner %d' % (len(a), len(b))
+    if ply_errors != fast_errors:
+        return 'errors differ: %r / %r' % (ply_errors[:3], fast_errors[:3])
+    # the bytes (memory-mapped file) path of the scanner
+    fast, fast_errors = scanner_tokens(text.encode('ascii'))
+    if token_tuples(fast) != b or fast_errors != ply_errors:
+        return 'the scanner gives other tokens for bytes than for str'
+    return None
+
+
+def tokens_per_second(tokenize, text):
+    start = time.perf_counter()
+    toks, errors = tokenize(text)
+    elapsed = time.perf_counter() - start
+    return len(toks), elapsed
+
+
+def run(megabytes):
+    text = random_source(int(megabytes * 1024 * 1024))
+    # the same, without illegal characters, as a real program
+    for source in (text, text.replace('$', ' ')):
+        difference = compare(source)
+        if difference is not None:
+            print('token streams differ:', difference)
+            sys.exit(1)
+    print('token streams identical on %.1f MB' % (len(text) / 1024 / 1024))
+    print('%-8s %10s %10s %14s %10s' % ('lexer', 'tokens', 'seconds', 'tokens/s', 'MB/s'))
+    for name, tokenize in (('PLY', ply_tokens), ('scanner', scanner_tokens)):
+        count, elapsed = tokens_per_second(tokenize, text)
+        print('%-8s %10d %10.3f %14.0f %10.2f' % (name, count, elapsed, count / elapsed,
+                                                  len(text) / elapsed / 1024 / 1024))
+
+
+if __name__ == '__main__':
+    run(float(sys.argv[1]) if len(sys.argv) > 1 else 4)
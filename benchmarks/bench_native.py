@@ -0,0 +1,64 @@
+# Builds generated programs (see generate.py) with native.py for every pass
+# list and C optimization level and reports, per pass list and level, the
+# total size of the binaries and the total of their best run times.  Any
+# build whose output differs from the unoptimized one, fails or times out
+# makes the exit status 1.
+#
+#   python benchmarks/bench_native.py [--programs N] [--statements N] [--levels 0 2]
+#                                     [--passes none default fold ...] [--cache-dir DIR]
+
+import argparse
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import native
+from generate import generate
+from optimize import PASSES
+
+
+def run(programs, statements, shape, pass_lists, levels, cache_dir=None, repeat=3):
+    sources = [('seed %d' % seed, generate(statements, seed=seed, **shape))
+               for seed in range(programs)]
+    with tempfile.TemporaryDirectory() as directory:
+        builder = native.Builder(native.BinaryCache(cache_dir or directory))
+        results = native.measure(sources, pass_lists, levels, builder, repeat)
+    totals = {}
+    for row in results:
+        total = totals.setdefault((row['passes'], row['level']), [0, 0, 0.0, 0])
+        if row['status'] == 'ok':
+            total[0] += row['instructions']
+            total[1] += row['size']
+            total[2] += row['run']
+        else:
+            total[3] += 1
+            print('%s, %s %s: %s%s' % (row['program'], row['passes'], row['level'],
+                                       row['status'], ': ' + row['error'] if 'error' in row else ''))
+    print('%-40s %5s %12s %10s %10s %6s' % ('passes', 'level', 'instructions', 'size', 'run',
+                                            'failed'))
+    for (passes, level), (instructions, size, seconds, failed) in totals.items():
+        print('%-40s %5s %12d %10d %10.4f %6d' % (passes, level, instructions, size, seconds,
+                                                   failed))
+    return sum(total[3] for total in totals.values())
+
+
+if __name__ == '__main__':
+    arg_parser = argparse.ArgumentParser(description='Measure the native builds.')
+    arg_parser.add_argument('--programs', type=int, default=10)
+    arg_parser.add_argument('--statements', type=int, default=200)
+    arg_parser.add_argument('--depth', type=int, default=3)
+    arg_parser.add_argument('--chain', type=int, default=3)
+    arg_parser.add_argument('--expr-depth', type=int, default=3)
+    arg_parser.add_argument('--levels', nargs='+', default=list(native.DEFAULT_LEVELS))
+    arg_parser.add_argument('--passes', nargs='+',
+                            help="pass lists to compare: comma separated passes, 'none' or "
+                                 "'default' (default: none, every pass alone, default)")
+    arg_parser.add_argument('--cache-dir', help='keep the binaries in this directory')
+    arg_parser.add_argument('--repeat', type=int, default=3)
+    args = arg_parser.parse_args()
+    pass_lists = native.parse_pass_lists(args.passes or ['none'] + list(PASSES) + ['default'])
+    shape = {'depth': args.depth, 'chain': args.chain, 'expr_depth': args.expr_depth}
+    sys.exit(1 if run(args.programs, args.statements, shape, pass_lists, args.levels,
+                      args.cache_dir, args.repeat) else 0)
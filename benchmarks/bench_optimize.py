@@ -0,0 +1,133 @@
+# Compiles generated programs (see generate.py) without and with the
+# optimization passes and reports the instructions and temps left and the
+# time the passes take.  When a C compiler is found, the C output of every
+# pass list is built (see native.py) and run, and its output must be the
+# one of the unoptimized program.
+#
+# With --scaling, the pass lists instead optimize one generated program of
+# every size given, and the growth of their time is reported like
+# bench_scaling.py does for the phases of the compile: the slope of
+# log(time) against log(instructions), above --threshold a pass list is
+# superlinear.  A linear pass measures 1 give or take the noise of the
+# timings, a quadratic one 2.
+#
+#   python benchmarks/bench_optimize.py [--programs N] [--statements N] [--passes fold ...]
+#   python benchmarks/bench_optimize.py --scaling 1000 2000 4000 8000
+
+import argparse
+import copy
+import gc
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import main
+import native
+import optimize
+from bench_scaling import slope
+from generate import generate
+from instrument import Profile
+
+
+def run(pass_lists, programs, statements, shape):
+    compiler = native.find_compiler()
+    main.get_parser()
+    totals = {passes: [0, 0, 0.0] for passes in pass_lists}
+    mismatches = 0
+    with tempfile.TemporaryDirectory() as directory:
+        builder = native.Builder(native.BinaryCache(directory), compiler) if compiler else None
+        for seed in range(programs):
+            source = generate(statements, seed=seed, **shape)
+            expected = None
+            for passes in pass_lists:
+                profile = Profile()
+                result = main.compile_source(source, 'none', scanner=True, profile=profile,
+                                             passes=passes)
+                totals[passes][0] += len(result.quadruples)
+                totals[passes][1] += len(result.temp_var_names)
+                totals[passes][2] += profile.phases['optimize']
+                if builder is not None:
+                    path = builder.build(result.c_text(), [])[0]
+                    output = native.run_binary(path, repeat=1)[0]
+                    if expected is None:
+                        expected = output
+                    elif output != expected:
+                        mismatches += 1
+                        print('seed %d: output of %s differs' % (seed, ','.join(passes)))
+    base = totals[pass_lists[0]][0]
+    print('%-40s %12s %8s %8s %10s' % ('passes', 'instructions', 'left', 'temps', 'seconds'))
+    for passes in pass_lists:
+        count, temps, seconds = totals[passes]
+        print('%-40s %12d %7.1f%% %8d %10.4f' % (','.join(passes) or '-', count,
+                                                  100.0 * count / base, temps, seconds))
+    if builder is None:
+        print('no C compiler found, outputs not compared')
+    return mismatches
+
+
+# the time of every pass list on a program of every size, the fastest of
+# `repeat` runs on copies of its unoptimized quadruples, timed after a
+# collection so the garbage of the parse is not counted; returns the pass
+# lists which grow faster than linearly
+def scaling(pass_lists, sizes, shape, repeat=3, threshold=1.5):
+    main.get_parser()
+    pass_lists = [passes for passes in pass_lists if passes]
+    instructions = []
+    seconds = {passes: [] for passes in pass_lists}
+    for size in sizes:
+        result = main.compile_source(generate(size, **shape), 'none', scanner=True, passes=())
+        instructions.append(len(result.quadruples))
+        for passes in pass_lists:
+            best = None
+            for i in range(repeat):
+                quadruples = copy.deepcopy(result.quadruples)
+                names = optimize.Names(result.temp_var_names, result.symbols.reals)
+                gc.collect()
+                start = time.perf_counter()
+                optimize.optimize(quadruples, passes, names)
+                elapsed = time.perf_counter() - start
+                if best is None or elapsed < best:
+                    best = elapsed
+            seconds[passes].append(best)
+    print('%-40s' % 'passes' + ''.join('%10d' % count for count in instructions) + '    growth')
+    superlinear = []
+    for passes in pass_lists:
+        growth = slope(instructions, seconds[passes])
+        print('%-40s' % ','.join(passes) + ''.join('%10.4f' % t for t in seconds[passes])
+              + '    ' + ('n/a' if growth is None else '%.2f' % growth))
+        if growth is not None and growth > threshold:
+            superlinear.append(passes)
+    if superlinear:
+        print('superlinear: ' + ', '.join(','.join(passes) for passes in superlinear))
+    return superlinear
+
+if __name__ == '__main__':
+    arg_parser = argparse.ArgumentParser(description='Measure the optimization passes.')
+    arg_parser.add_argument('--programs', type=int, default=20)
+    arg_parser.add_argument('--statements', type=int, default=200)
+    arg_parser.add_argument('--depth', type=int, default=3)
+    arg_parser.add_argument('--chain', type=int, default=3)
+    arg_parser.add_argument('--expr-depth', type=int, default=3)
+    arg_parser.add_argument('--passes', nargs='*',
+                            help='comma separated pass lists to compare (default: every '
+                                 'pass alone, then the default passes)')
+    arg_parser.add_argument('--scaling', type=int, nargs='+', metavar='STATEMENTS',
+                            help='time the passes on one program of each of these numbers '
+                                 'of statements instead')
+    arg_parser.add_argument('--threshold', type=float, default=1.5,
+                            help='growth (log-log slope) above which a pass list is '
+                                 'superlinear')
+    args = arg_parser.parse_args()
+    if args.passes:
+        pass_lists = [tuple(passes.split(',')) for passes in args.passes]
+    else:
+        pass_lists = [(name,) for name in optimize.PASSES] + [optimize.DEFAULT_PASSES]
+    pass_lists = [()] + [passes for i, passes in enumerate(pass_lists)
+                         if passes not in pass_lists[:i]]
+    shape = {'depth': args.depth, 'chain': args.chain, 'expr_depth': args.expr_depth}
+    if args.scaling:
+        sys.exit(1 if scaling(pass_lists, args.scaling, shape, threshold=args.threshold) else 0)
+    sys.exit(1 if run(pass_lists, args.programs, args.statements, shape) else 0)
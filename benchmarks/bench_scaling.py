@@ -0,0 +1,161 @@
+# Times the phases of a compile on generated programs (see generate.py)
+# of growing size, writes the results as JSON and flags the phases whose
+# time grows faster than the program.
+#
+#   lex         tokenizing the source alone
+#   parse       the compile minus lex and backpatch: the parser and the
+#               grammar actions
+#   backpatch   the time spent in Quadruples.backpatch
+#   emit        generating the C text (declarations and instructions)
+#
+# Every size is compiled `repeat` times and the fastest time of each phase
+# is kept.  The growth of a phase is the slope of log(time) against
+# log(tokens), the size of the program; a slope above `threshold` is
+# reported as superlinear.
+#
+#   python benchmarks/bench_scaling.py [--sizes 500 1000 2000 4000] [-o results.json]
+
+import argparse
+import contextlib
+import json
+import math
+import os
+import platform
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import ir
+import main
+from generate import generate
+from scanner import Scanner
+
+PHASES = ('lex', 'parse', 'backpatch', 'emit')
+
+
+# replaces Quadruples.backpatch with a timed version while it is used
+@contextlib.contextmanager
+def timed_backpatch(timing):
+    backpatch = ir.Quadruples.backpatch
+
+    def timed(self, plist, label):
+        start = time.perf_counter()
+        backpatch(self, plist, label)
+        timing[0] += time.perf_counter() - start
+
+    ir.Quadruples.backpatch = timed
+    try:
+        yield
+    finally:
+        ir.Quadruples.backpatch = backpatch
+
+
+def lex(source, scanner):
+    lexer = Scanner() if scanner else main.get_lexer().clone()
+    lexer.session = main.CompilerSession()
+    lexer.input(source)
+    count = 0
+    while lexer.token() is not None:
+        count += 1
+    return count
+
+
+def measure(source, scanner):
+    start = time.perf_counter()
+    tokens = lex(source, scanner)
+    lex_time = time.perf_counter() - start
+    timing = [0.0]
+    with timed_backpatch(timing):
+        start = time.perf_counter()
+        result = main.compile_source(source, ast_mode='none', scanner=scanner)
+        compile_time = time.perf_counter() - start
+    start = time.perf_counter()
+    result.c_text()
+    emit_time = time.perf_counter() - start
+    return {'tokens': tokens,
+            'instructions': len(result.quadruples),
+            'temps': len(result.temp_var_names),
+            'lex': lex_time,
+            'parse': max(0.0, compile_time - lex_time - timing[0]),
+            'backpatch': timing[0],
+            'emit': emit_time}
+
+
+# least squares slope of log(y) against log(x)
+def slope(xs, ys):
+    points = [(math.log(x), math.log(y)) for x, y in zip(xs, ys) if y > 0]
+    if len(points) < 2:
+        return None
+    mean_x = sum(x for x, y in points) / len(points)
+    mean_y = sum(y for x, y in points) / len(points)
+    variance = sum((x - mean_x) ** 2 for x, y in points)
+    if variance == 0:
+        return None
+    return sum((x - mean_x) * (y - mean_y) for x, y in points) / variance
+
+
+def run(sizes, shape, repeat=3, scanner=False, threshold=1.15):
+    main.get_parser()
+    results = []
+    print('%10s %8s %8s %10s %10s %10s %10s' % ('statements', 'tokens', 'instrs',
+                                                 'lex', 'parse', 'backpatch', 'emit'))
+    for size in sizes:
+        source = generate(size, **shape)
+        best = None
+        for i in range(repeat):
+            timings = measure(source, scanner)
+            if best is None:
+                best = timings
+            else:
+                for phase in PHASES:
+                    best[phase] = min(best[phase], timings[phase])
+        best['statements'] = size
+        results.append(best)
+        print('%10d %8d %8d %10.4f %10.4f %10.4f %10.4f' % (
+            size, best['tokens'], best['instructions'],
+            best['lex'], best['parse'], best['backpatch'], best['emit']))
+    slopes = {}
+    superlinear = []
+    for phase in PHASES:
+        slopes[phase] = slope([r['tokens'] for r in results], [r[phase] for r in results])
+        if slopes[phase] is not None and slopes[phase] > threshold:
+            superlinear.append(phase)
+    print('growth: ' + ', '.join('%s %s' % (phase, 'n/a' if slopes[phase] is None
+                                            else '%.2f' % slopes[phase]) for phase in PHASES))
+    if superlinear:
+        print('superlinear: ' + ', '.join(superlinear))
+    return {'python': platform.python_version(),
+            'lexer': 'scanner' if scanner else 'ply',
+            'shape': shape,
+            'repeat': repeat,
+            'threshold': threshold,
+            'results': results,
+            'slopes': slopes,
+            'superlinear': superlinear}
+
+
+if __name__ == '__main__':
+    arg_parser = argparse.ArgumentParser(description='Time the compiler phases across sizes.')
+    arg_parser.add_argument('--sizes', type=int, nargs='+', default=[500, 1000, 2000, 4000],
+                            help='numbers of statements')
+    arg_parser.add_argument('--depth', type=int, default=2)
+    arg_parser.add_argument('--chain', type=int, default=2)
+    arg_parser.add_argument('--expr-depth', type=int, default=2)
+    arg_parser.add_argument('--variables', type=int, default=8)
+    arg_parser.add_argument('--seed', type=int, default=0)
+    arg_parser.add_argument('--repeat', type=int, default=3)
+    arg_parser.add_argument('--scanner', action='store_true',
+                            help='use the hand-written scanner instead of the PLY lexer')
+    arg_parser.add_argument('--threshold', type=float, default=1.15,
+                            help='growth (log-log slope) above which a phase is superlinear')
+    arg_parser.add_argument('-o', '--output', help='write the results as JSON to this file')
+    args = arg_parser.parse_args()
+    shape = {'depth': args.depth, 'chain': args.chain, 'expr_depth': args.expr_depth,
+             'variables': args.variables, 'seed': args.seed}
+    report = run(args.sizes, shape, args.repeat, args.scanner, args.threshold)
+    if args.output:
+        with open(args.output, 'w') as fp:
+            json.dump(report, fp, indent=2)
+            fp.write('\n')
+    sys.exit(1 if report['superlinear'] else 0)
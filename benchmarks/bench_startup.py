@@ -0,0 +1,50 @@
+# Measures what a short-lived compiler process pays before its first
+# result: interpreter start, `import main`, and the first compile (which
+# builds the lexer and loads or generates the parser tables).  The first
+# run uses an empty table directory (cold), the others find the cached
+# tables (warm).
+#
+#   python benchmarks/bench_startup.py [runs]
+
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+CHILD = '''
+import json, sys, time
+start = time.perf_counter()
+import main
+imported = time.perf_counter()
+main.compile_source('program p var a, b: int begin while a < 10 do a := a + 1; b := a end')
+compiled = time.perf_counter()
+sys.stderr.write(json.dumps([imported - start, compiled - imported]) + '\\n')
+'''
+
+
+def run_child(table_dir):
+    env = dict(os.environ, COMPILER_TABLE_DIR=table_dir)
+    start = time.perf_counter()
+    child = subprocess.run([sys.executable, '-c', CHILD], cwd=ROOT, env=env,
+                           stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+                           text=True, check=True)
+    wall = time.perf_counter() - start
+    import_time, compile_time = json.loads(child.stderr.strip().splitlines()[-1])
+    return import_time, compile_time, wall
+
+
+def run(runs):
+    print('%-6s %12s %18s %12s' % ('run', 'import ms', 'first compile ms', 'process ms'))
+    with tempfile.TemporaryDirectory() as table_dir:
+        for i in range(runs):
+            import_time, compile_time, wall = run_child(table_dir)
+            print('%-6s %12.2f %18.2f %12.2f' % ('cold' if i == 0 else 'warm',
+                                               import_time * 1e3, compile_time * 1e3, wall * 1e3))
+
+
+if __name__ == '__main__':
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 5)
@@ -0,0 +1,59 @@
+# Compares the peak memory (tracemalloc) and the time of writing the C
+# file of a long program from the quadruples (compile, then c_text) and
+# while parsing (output=, see stream.py).  With streaming the peak should
+# stay flat as the program grows.
+#
+#   python benchmarks/bench_streaming.py [max_statements]
+
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import main
+
+
+def long_program(statements):
+    body = []
+    for i in range(statements // 3):
+        body.append('iid_1 := iid_1 + %d' % i)
+        body.append('if (iid_1 > %d) && (iid_2 < 5) then iid_2 := iid_2 + 1 else iid_2 := 0' % i)
+        body.append('while iid_2 < %d do iid_2 := iid_2 + 2' % (i % 7))
+    return 'program long var iid_1, iid_2: int begin %s end' % ';\n'.join(body)
+
+
+def measure(source, path, stream):
+    tracemalloc.start()
+    start = time.perf_counter()
+    if stream:
+        main.compile_source(source, ast_mode='none', scanner=True, output=path)
+    else:
+        c_text = main.compile_source(source, ast_mode='none', scanner=True).c_text()
+        with open(path, 'w') as fp:
+            fp.write(c_text)
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+def run(max_statements):
+    main.get_parser()
+    print('%10s %8s %10s %12s' % ('statements', 'mode', 'seconds', 'peak KiB'))
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'long.c')
+        statements = 2000
+        while statements <= max_statements:
+            source = long_program(statements)
+            for stream in (False, True):
+                elapsed, peak = measure(source, path, stream)
+                print('%10d %8s %10.4f %12d' % (statements, 'stream' if stream else 'memory',
+                                                elapsed, peak // 1024))
+            statements *= 2
+
+
+if __name__ == '__main__':
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 16000)
\ No newline at end of file
@@ -0,0 +1,95 @@
+# Compiles a loop around a switch of n cases with each way of testing the
+# value (see CompilerSession.dispatch) and, when a C compiler is found,
+# builds (see native.py) and runs the programs: a jump table should take
+# the same time whatever n is, a binary search log(n) and a chain of tests
+# n.  The cases are dense (consecutive constants) or sparse (constants
+# `stride` apart).  Every case adds a different amount to the loop
+# counter, so the outputs of the strategies must be the same.  The
+# programs are built with -O0 by default, gcc would otherwise turn a chain
+# of tests into a switch of its own.
+#
+#   python benchmarks/bench_switch.py [--cases 8 64 512 4096] [--stride 7] [--loops N]
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import main
+import native
+
+# (LINEAR_CASES, TABLE_DENSITY) forcing every strategy, 'auto' is the default
+STRATEGIES = {
+    'auto': (main.LINEAR_CASES, main.TABLE_DENSITY),
+    'linear': (float('inf'), main.TABLE_DENSITY),
+    'search': (1, float('inf')),
+    'table': (1, 0.0),
+}
+
+
+def switch_program(cases, stride, loops):
+    body = ';\n'.join('%d: iid_1 := iid_1 + %d' % (k * stride, 1 + k % 3) for k in range(cases))
+    return ('program cases\nvar iid_1: int\nbegin\niid_1 := 0;\n'
+            'while (iid_1 < %d) do switch (iid_1 %% %d) * %d of\n%s;\n'
+            'default: iid_1 := iid_1 + 1\ndone;\nprint(iid_1)\nend\n'
+            % (loops, cases + 1, stride, body))
+
+
+def compile_with(source, strategy):
+    saved = main.LINEAR_CASES, main.TABLE_DENSITY
+    main.LINEAR_CASES, main.TABLE_DENSITY = STRATEGIES[strategy]
+    try:
+        start = time.perf_counter()
+        result = main.compile_source(source, ast_mode='none')
+        return result, time.perf_counter() - start
+    finally:
+        main.LINEAR_CASES, main.TABLE_DENSITY = saved
+
+
+def run(case_counts, strides, loops, cflags):
+    compiler = native.find_compiler()
+    main.get_parser()
+    mismatches = 0
+    print('%7s %7s %-7s %13s %10s %10s' % ('cases', 'stride', 'tests', 'instructions',
+                                          'compile', 'run'))
+    with tempfile.TemporaryDirectory() as directory:
+        builder = native.Builder(native.BinaryCache(directory), compiler) if compiler else None
+        for cases in case_counts:
+            for stride in strides:
+                source = switch_program(cases, stride, loops)
+                expected = None
+                for strategy in STRATEGIES:
+                    result, compile_seconds = compile_with(source, strategy)
+                    run_seconds = float('nan')
+                    if builder is not None:
+                        path, metadata = builder.build(result.c_text(), cflags)
+                        output, run_seconds = native.run_binary(path, repeat=1, timeout=None)
+                        if expected is None:
+                            expected = output
+                        elif output != expected:
+                            mismatches += 1
+                            print('%d cases, stride %d: output of %s differs'
+                                  % (cases, stride, strategy))
+                    print('%7d %7d %-7s %13d %10.4f %10.4f' % (
+                        cases, stride, strategy, len(result.quadruples),
+                        compile_seconds, run_seconds))
+    if builder is None:
+        print('no C compiler found, programs not run')
+    return mismatches
+
+
+if __name__ == '__main__':
+    arg_parser = argparse.ArgumentParser(description='Measure the switch dispatch.')
+    arg_parser.add_argument('--cases', type=int, nargs='+', default=[8, 64, 512, 4096])
+    arg_parser.add_argument('--stride', type=int, nargs='+', default=[1, 7],
+                            help='distance between the case constants')
+    arg_parser.add_argument('--loops', type=int, default=2000000,
+                            help='the loop runs until the counter reaches this')
+    arg_parser.add_argument('--cflags', default='-O0',
+                            help='C compiler options for the programs (quoted, space '
+                                 'separated)')
+    args = arg_parser.parse_args()
+    sys.exit(1 if run(args.cases, args.stride, args.loops, args.cflags.split()) else 0)
@@ -0,0 +1,95 @@
+# Runs programs over many inputs with vector.py, all the lanes at once, and
+# with vm.py, once per input, and reports both times; the output of every
+# lane must be the one of its scalar run.  The programs are
+#
+#   generated  a program of generate.py whose variables iid_2..iid_5 are
+#              the inputs (their first assignments are taken out)
+#   sum        a loop going 200 times in every lane, adding up a function
+#              of the input (the counter is kept in the low digits of the
+#              sum, a loop body being one statement)
+#   gcd        the gcd of two inputs by subtractions, a loop going a
+#              different number of times in every lane
+#
+#   python benchmarks/bench_vector.py [--lanes 100 1000 10000] [--programs sum ...]
+
+import argparse
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import main
+import vector
+import vm
+from generate import generate
+
+INPUTS = ('iid_2', 'iid_3', 'iid_4', 'iid_5')
+
+
+def generated_program(lanes):
+    source = generate(200, seed=0, depth=3, chain=3, expr_depth=3)
+    for name in INPUTS:
+        source = re.sub(r'\n%s := -?\d+;' % name, '', source, count=1)
+    rnd = random.Random(0)
+    return source, {name: [rnd.randrange(-100, 100) for lane in range(lanes)]
+                    for name in INPUTS}
+
+
+def sum_program(lanes):
+    source = ('program sum\nvar k, s: int\nbegin\ns := 0;\n'
+              'while ((s % 1000) < 200) do s := s + 1 + 1000 * ((k * (s % 1000) + k / 3) % 7);\n'
+              'print(s / 1000)\nend\n')
+    return source, {'k': list(range(lanes))}
+
+
+def gcd_program(lanes):
+    source = ('program gcd\nvar a, b: int\nbegin\n'
+              'while (a <> b) do if (a > b) then a := a - b else b := b - a;\n'
+              'print(a)\nend\n')
+    return source, {'a': list(range(1, lanes + 1)), 'b': [360 + lane % 97 for lane in range(lanes)]}
+
+
+PROGRAMS = {'generated': generated_program, 'sum': sum_program, 'gcd': gcd_program}
+
+
+def run(lane_counts, programs, passes):
+    main.get_parser()
+    mismatches = 0
+    print('%-10s %7s %10s %10s %10s %8s' % ('program', 'lanes', 'blocks', 'vector', 'scalar',
+                                            'speedup'))
+    for name in programs:
+        for lanes in lane_counts:
+            source, inputs = PROGRAMS[name](lanes)
+            result = main.compile_source(source, 'none', passes=passes)
+            program = vector.load(result.quadruples, result.symbols)
+            start = time.perf_counter()
+            outputs = program.run(inputs, lanes)
+            vector_seconds = time.perf_counter() - start
+            scalar = vm.load(result.quadruples, result.symbols)
+            start = time.perf_counter()
+            expected = [scalar.run(inputs={variable: values[lane]
+                                           for variable, values in inputs.items()})
+                        for lane in range(lanes)]
+            scalar_seconds = time.perf_counter() - start
+            if outputs != expected:
+                mismatches += 1
+                print('%s, %d lanes: outputs differ from the scalar runs' % (name, lanes))
+            print('%-10s %7d %10d %10.4f %10.4f %7.1fx' % (
+                name, lanes, program.steps, vector_seconds, scalar_seconds,
+                scalar_seconds / vector_seconds))
+    return mismatches
+
+
+if __name__ == '__main__':
+    arg_parser = argparse.ArgumentParser(description='Measure the vectorized execution.')
+    arg_parser.add_argument('--lanes', type=int, nargs='+', default=[100, 1000, 10000])
+    arg_parser.add_argument('--programs', nargs='+', choices=sorted(PROGRAMS),
+                            default=list(PROGRAMS))
+    arg_parser.add_argument('--passes', default='',
+                            help='comma separated optimization passes to compile with')
+    args = arg_parser.parse_args()
+    passes = tuple(name for name in args.passes.split(',') if name)
+    sys.exit(1 if run(args.lanes, args.programs, passes) else 0)
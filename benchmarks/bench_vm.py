@@ -0,0 +1,74 @@
+# Runs generated programs (see generate.py) in-process with vm.py and
+# reports the instructions run per second, next to the time of building
+# and running their C output (see native.py).  When a C compiler is found,
+# the output of every program must be the one of its C build.
+#
+#   python benchmarks/bench_vm.py [--programs N] [--statements N] [--passes fold,lvn ...]
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import main
+import native
+import vm
+from generate import generate
+
+
+def run(programs, statements, shape, passes, repeat=3):
+    compiler = native.find_compiler()
+    main.get_parser()
+    mismatches = 0
+    total_executed = total_seconds = 0
+    print('%6s %13s %10s %10s %10s %14s %10s' % ('seed', 'instructions', 'executed', 'load',
+                                                 'run', 'instrs/second', 'C'))
+    with tempfile.TemporaryDirectory() as directory:
+        builder = native.Builder(native.BinaryCache(directory), compiler) if compiler else None
+        for seed in range(programs):
+            result = main.compile_source(generate(statements, seed=seed, **shape), 'none',
+                                         scanner=True, passes=passes)
+            start = time.perf_counter()
+            program = vm.load(result.quadruples, result.symbols)
+            load_seconds = time.perf_counter() - start
+            run_seconds = float('inf')
+            for i in range(repeat):
+                start = time.perf_counter()
+                output = program.run()
+                run_seconds = min(run_seconds, time.perf_counter() - start)
+            total_executed += program.executed
+            total_seconds += run_seconds
+            c_seconds = float('nan')
+            if builder is not None:
+                path, metadata = builder.build(result.c_text(), [])
+                expected, c_seconds = native.run_binary(path, repeat=1)
+                c_seconds += metadata['seconds']
+                if output != expected.decode():
+                    mismatches += 1
+                    print('seed %d: output differs from the C build' % seed)
+            print('%6d %13d %10d %10.4f %10.4f %14.0f %10.4f' % (
+                seed, len(result.quadruples), program.executed, load_seconds, run_seconds,
+                program.executed / run_seconds, c_seconds))
+    print('%d instructions run in %.4f seconds, %.0f per second'
+          % (total_executed, total_seconds, total_executed / total_seconds))
+    if builder is None:
+        print('no C compiler found, outputs not compared')
+    return mismatches
+
+
+if __name__ == '__main__':
+    arg_parser = argparse.ArgumentParser(description='Measure the quadruple interpreter.')
+    arg_parser.add_argument('--programs', type=int, default=10)
+    arg_parser.add_argument('--statements', type=int, default=200)
+    arg_parser.add_argument('--depth', type=int, default=3)
+    arg_parser.add_argument('--chain', type=int, default=3)
+    arg_parser.add_argument('--expr-depth', type=int, default=3)
+    arg_parser.add_argument('--passes', default='',
+                            help='comma separated optimization passes to compile with')
+    args = arg_parser.parse_args()
+    shape = {'depth': args.depth, 'chain': args.chain, 'expr_depth': args.expr_depth}
+    passes = tuple(name for name in args.passes.split(',') if name)
+    sys.exit(1 if run(args.programs, args.statements, shape, passes) else 0)
@@ -0,0 +1,180 @@
+# Generates valid programs of a given size and shape, for the benchmarks.
+#
+#   statements   number of statements of the program body
+#   depth        how deep if/while statements are nested
+#   chain        number of relational tests joined by && / || in a condition
+#   expr_depth   depth of the arithmetic expressions
+#   variables    number of declared int variables
+#   reals        number of declared real variables
+#
+# The int variables are named iid_1..iid_N, the real ones rid_1..rid_M.
+# Generated programs terminate: loops count iid_1, which is only ever
+# reset to 0 or incremented, and every path through a loop body
+# increments it (nested loops count it up to a higher bound); divisions
+# are by nonzero constants, and assignments keep their value below 10007
+# (50000 for the reals and the ints converted from them) so there is no
+# int overflow up to expr_depth 4.
+#
+# The reals are copied, converted, compared, printed and used in
+# operations of depth 1, never as a dividend of %.  Their constants have
+# two decimals, most of them not exact in a float, so a pass reading the
+# double constant instead of the float stored from it shows.  The VM
+# computes in doubles and rounds every real it stores to a float: the
+# double of a sum, difference, product or quotient of floats rounds to
+# the float C computes, so it prints what the C program does.
+#
+#   python benchmarks/generate.py [--statements N] [--depth D] ... > program.txt
+
+import argparse
+import random
+
+
+class Generator:
+    def __init__(self, depth=2, chain=2, expr_depth=2, variables=8, reals=2, seed=0):
+        self.depth = depth
+        self.chain = chain
+        self.expr_depth = expr_depth
+        self.random = random.Random(seed)
+        # the loop counter, the other variables are for the assignments and
+        # the conditions
+        self.counter = 'iid_1'
+        self.variables = ['iid_%d' % (i + 2) for i in range(max(1, variables - 1))]
+        self.reals = ['rid_%d' % (i + 1) for i in range(reals)]
+
+    def program(self, statements):
+        body = ['%s := %d' % (name, self.random.randint(0, 99)) for name in self.variables]
+        body += ['%s := %s' % (name, self.real_constant()) for name in self.reals]
+        for i in range(statements):
+            body.append(self.statement(self.depth))
+        declarations = ', '.join([self.counter] + self.variables) + ': int'
+        if self.reals:
+            declarations += '; %s: real' % ', '.join(self.reals)
+        return 'program generated\nvar %s\nbegin\n%s\nend\n' % (declarations, ';\n'.join(body))
+
+    # a statement of the body; loops there start by resetting the counter
+    def statement(self, depth):
+        choice = self.random.random()
+        if depth > 0 and choice < 0.2:
+            return '%s := 0;\n%s' % (self.counter, self.loop(depth))
+        if depth > 0 and choice < 0.45:
+            return self.if_statement(depth)
+        if choice < 0.9:
+            return self.assignment()
+        return self.print_statement()
+
+    def loop(self, depth, bound=0):
+        bound += self.random.randint(1, 5)
+        return 'while %s < %d do %s' % (self.counter, bound, self.counting(bound, depth - 1))
+
+    def if_statement(self, depth):
+        condition = self.condition()
+        if self.random.random() < 0.5:
+            return 'if %s then %s' % (condition, self.nested(depth - 1))
+        return 'if %s then %s else %s' % (condition, self.nested(depth - 1),
+                                          self.nested(depth - 1))
+
+    # a statement inside an if
+    def nested(self, depth):
+        choice = self.random.random()
+        if depth > 0 and choice < 0.15:
+            return self.loop(depth)
+        if depth > 0 and choice < 0.5:
+            return self.if_statement(depth)
+        if choice < 0.9:
+            return self.assignment()
+        return self.print_statement()
+
+    # a loop body: a statement which increments the counter on every path,
+    # so the loop `while counter < bound` terminates.  A nested loop has a
+    # bound at least as high, it runs (and increments) at least once.
+    def counting(self, bound, depth):
+        choice = self.random.random()
+        if depth > 0 and choice < 0.3:
+            return self.loop(depth, bound - 1)
+        if depth > 0 and choice < 0.6:
+            return 'if %s then %s else %s' % (self.condition(), self.counting(bound, depth - 1),
+                                              self.counting(bound, depth - 1))
+        return '%s := %s + %d' % (self.counter, self.counter, self.random.randint(1, 2))
+
+    def assignment(self):
+        target = self.random.choice(self.variables + self.reals)
+        choice = self.random.random()
+        if choice < 0.1:
+            return '%s := %s' % (target, self.relation())
+        if self.reals and choice < 0.2:
+            # a copy or a conversion
+            return '%s := %s' % (target, self.random.choice(self.reals + [self.real_constant()]))
+        if self.reals and choice < 0.3:
+            return '%s := %s' % (target, self.real_operation())
+        return '%s := (%s) %% 10007' % (target, self.expression(self.expr_depth))
+
+    def print_statement(self):
+        if self.reals and self.random.random() < 0.3:
+            return 'print(%s)' % self.random.choice(self.reals + [self.real_operation()])
+        return 'print(%s)' % self.expression(self.expr_depth)
+
+    # relational tests joined by && and ||; every operand is parenthesized
+    # since the relational operators have no precedence
+    def condition(self):
+        terms = [self.relation() for i in range(self.chain)]
+        condition = terms[0]
+        for term in terms[1:]:
+            condition = '%s %s %s' % (condition, self.random.choice(('&&', '||')), term)
+        if self.random.random() < 0.1:
+            condition = '!(%s)' % condition
+        return condition
+
+    def relation(self):
+        op = self.random.choice(('<', '<=', '>', '>=', '=', '<>'))
+        return '(%s %s %s)' % (self.expression(1, True), op, self.expression(1, True))
+
+    # leaves are variables and constants below 100, reals among them when
+    # `reals`; products and quotients take a constant right operand
+    def expression(self, depth, reals=False):
+        if depth <= 0 or self.random.random() < 0.2:
+            if self.random.random() < 0.7:
+                return self.random.choice(self.variables + self.reals if reals
+                                          else self.variables)
+            if reals and self.reals and self.random.random() < 0.3:
+                return self.real_constant()
+            return str(self.random.randint(0, 99))
+        op = self.random.choice(('+', '-', '*', '/', '%'))
+        left = self.expression(depth - 1, reals and op != '%')
+        if op in ('+', '-'):
+            right = self.expression(depth - 1, reals)
+        else:
+            right = str(self.random.randint(1, 9))
+        return '(%s %s %s)' % (left, op, right)
+
+    # an operation giving a real, computed in a float temp: an int variable
+    # plus, minus or times a real constant, or a quotient by an int
+    # constant, so the reals stay below 50000 whatever is assigned
+    def real_operation(self):
+        op = self.random.choice(('+', '-', '*', '/'))
+        if op == '/':
+            return '(%s / %d)' % (self.random.choice(self.variables + self.reals),
+                                  self.random.randint(1, 9))
+        if op == '*':
+            return '(%s * %d.5)' % (self.random.choice(self.variables), self.random.randint(0, 3))
+        return '(%s %s %s)' % (self.random.choice(self.variables), op, self.real_constant())
+
+    def real_constant(self):
+        return '%d.%02d' % (self.random.randint(0, 99), self.random.randint(0, 99))
+
+
+def generate(statements=100, depth=2, chain=2, expr_depth=2, variables=8, reals=2, seed=0):
+    return Generator(depth, chain, expr_depth, variables, reals, seed).program(statements)
+
+
+if __name__ == '__main__':
+    arg_parser = argparse.ArgumentParser(description='Generate a program.')
+    arg_parser.add_argument('--statements', type=int, default=100)
+    arg_parser.add_argument('--depth', type=int, default=2)
+    arg_parser.add_argument('--chain', type=int, default=2)
+    arg_parser.add_argument('--expr-depth', type=int, default=2)
+    arg_parser.add_argument('--variables', type=int, default=8)
+    arg_parser.add_argument('--reals', type=int, default=2)
+    arg_parser.add_argument('--seed', type=int, default=0)
+    args = arg_parser.parse_args()
+    print(generate(args.statements, args.depth, args.chain, args.expr_depth, args.variables,
+                   args.reals, args.seed), end='')
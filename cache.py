@@ -0,0 +1,141 @@
+# On-disk cache of compiled programs, for rebuilds where most sources did
+# not change.
+#
+# An entry is keyed by the sha256 of the compiler version (the text of the
+# compiler modules, grammar included), the compile options and the source.
+# It is two files under <directory>/<first two hex digits of the key>/:
+#
+#   <key>.c      the C text, copied as it is to the output
+#   <key>.json   metadata of the compile (program name, sizes, seconds)
+#
+# (subclasses keep other files than C text, see native.py, under their
+# own extension)
+#
+# Files are written to a temporary name and renamed, so worker processes
+# can share a cache: a reader sees a whole entry or no entry, and an entry
+# evicted under a reader is just a miss.  The last use of an entry is the
+# mtime of its .c file; evict() removes the least recently used entries
+# until the cache fits its size.
+
+import hashlib
+import json
+import os
+import shutil
+import sys
+import tempfile
+
+# the modules whose text decides the generated code
+COMPILER_MODULES = ('cfg', 'main', 'ir', 'nodes', 'optimize', 'scanner', 'stream', 'symbols')
+DEFAULT_SIZE = 256 * 1024 * 1024
+
+_version = None
+
+
+def compiler_version():
+    global _version
+    if _version is None:
+        digest = hashlib.sha256()
+        for name in COMPILER_MODULES:
+            __import__(name)
+            with open(sys.modules[name].__file__, 'rb') as fp:
+                digest.update(fp.read())
+        _version = digest.hexdigest()
+    return _version
+
+
+class Cache:
+    extension = '.c'
+
+    def __init__(self, directory, max_size=DEFAULT_SIZE):
+        self.directory = directory
+        self.max_size = max_size
+
+    # options is a dict of everything besides the source which changes the
+    # output (it must be JSON serializable)
+    def key(self, source, options):
+        digest = hashlib.sha256()
+        digest.update(compiler_version().encode('ascii'))
+        digest.update(json.dumps(options, sort_keys=True).encode('utf-8'))
+        digest.update(b'\0')
+        digest.update(source)
+        return digest.hexdigest()
+
+    def path(self, key, extension):
+        return os.path.join(self.directory, key[:2], key + extension)
+
+    # copies the C text of the entry to output and returns its metadata,
+    # or returns None on a miss
+    def get(self, key, output):
+        try:
+            with open(self.path(key, '.json')) as fp:
+                metadata = json.load(fp)
+            shutil.copyfile(self.path(key, self.extension), output)
+            os.utime(self.path(key, self.extension))
+        except (OSError, ValueError):
+            return None
+        return metadata
+
+    # stores the C file at c_path (which is left in place, and whose mode
+    # the entry keeps)
+    def put(self, key, c_path, metadata):
+        directory = os.path.join(self.directory, key[:2])
+        os.makedirs(directory, exist_ok=True)
+        # the metadata first: an entry exists once its .c file does
+        self.write(self.path(key, '.json'), json.dumps(metadata).encode('utf-8'))
+        fd, temp_path = tempfile.mkstemp(dir=directory)
+        os.close(fd)
+        try:
+            shutil.copyfile(c_path, temp_path)
+            shutil.copymode(c_path, temp_path)
+            os.replace(temp_path, self.path(key, self.extension))
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+
+    def write(self, path, data):
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+        try:
+            with os.fdopen(fd, 'wb') as fp:
+                fp.write(data)
+            os.replace(temp_path, path)
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+
+    # removes the least recently used entries until the cache is not
+    # bigger than max_size; returns the number of entries removed
+    def evict(self):
+        entries = []
+        total = 0
+        try:
+            subdirectories = os.listdir(self.directory)
+        except FileNotFoundError:
+            return 0
+        for subdirectory in subdirectories:
+            directory = os.path.join(self.directory, subdirectory)
+            if not os.path.isdir(directory):
+                continue
+            for name in os.listdir(directory):
+                if not name.endswith(self.extension):
+                    continue
+                path = os.path.join(directory, name)
+                metadata = path[:-len(self.extension)] + '.json'
+                try:
+                    stat = os.stat(path)
+                    size = stat.st_size + os.stat(metadata).st_size
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, path, metadata, size))
+                total += size
+        removed = 0
+        for mtime, path, metadata, size in sorted(entries):
+            if total <= self.max_size:
+                break
+            for name in (path, metadata):
+                try:
+                    os.unlink(name)
+                except FileNotFoundError:
+                    pass
+            total -= size
+            removed += 1
+        return removed
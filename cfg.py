@@ -0,0 +1,309 @@
+# Control-flow graph of the quadruples of ir.py, and dataflow analyses.
+#
+# The basic blocks are the runs of instructions between leaders: the first
+# instruction, the jump targets and the instructions after jumps.  Block b
+# holds the instructions start[b] <= i < end[b].  The end of the program
+# (instruction len(quadruples), where jumps may go) is not a block: the
+# blocks going there are the exits.
+#
+# The sets of the analyses are ints used as bit vectors, bit k standing
+# for the k-th definition, name or expression of the analysis.  solve() is
+# a worklist solver for all of them: it goes over the blocks in reverse
+# postorder (postorder for a backward analysis) visiting the ones whose
+# inputs changed, again until none did.  A change then reaches the blocks
+# after it in the same pass, and an analysis costs about as many passes as
+# the loops are nested, of a few big int operations per visited block.
+
+from array import array
+
+from ir import ARITHMETIC_OPS, GOTO_OPS, JUMP_OPS
+
+
+# leaders[i] is 1 when instruction i starts a basic block
+def block_leaders(quadruples):
+    ops = quadruples.op
+    target = quadruples.target
+    size = len(quadruples)
+    leaders = bytearray(size + 1)
+    leaders[0] = 1
+    for i in range(size):
+        if ops[i] in JUMP_OPS:
+            leaders[target[i]] = 1
+            leaders[i + 1] = 1
+    return leaders
+
+
+# (start, end) of every basic block
+def blocks(leaders, size):
+    start = 0
+    for i in range(1, size + 1):
+        if i == size or leaders[i]:
+            if start < i:
+                yield start, i
+            start = i
+
+
+class CFG:
+    __slots__ = ('start', 'end', 'block_of', 'successors', 'predecessors', 'exits',
+                 '_order', '_idom')
+
+    def __init__(self, quadruples):
+        ops = quadruples.op
+        target = quadruples.target
+        size = len(quadruples)
+        self.start = array('l')
+        self.end = array('l')
+        self.block_of = array('l', [0]) * (size + 1)
+        for start, end in blocks(block_leaders(quadruples), size):
+            b = len(self.start)
+            self.start.append(start)
+            self.end.append(end)
+            self.block_of[start:end] = array('l', [b]) * (end - start)
+        count = len(self.start)
+        self.block_of[size] = count
+        self.successors = [[] for b in range(count)]
+        self.predecessors = [[] for b in range(count)]
+        self.exits = bytearray(count)
+        for b in range(count):
+            last = self.end[b] - 1
+            following = []
+            if ops[last] in JUMP_OPS:
+                following.append(target[last])
+            if ops[last] not in GOTO_OPS:
+                following.append(last + 1)
+            for i in following:
+                if i == size:
+                    self.exits[b] = 1
+                    continue
+                s = self.block_of[i]
+                if s not in self.successors[b]:
+                    self.successors[b].append(s)
+                    self.predecessors[s].append(b)
+        self._order = None
+        self._idom = None
+
+    def __len__(self):
+        return len(self.start)
+
+    # the blocks reachable from the first one, in reverse postorder
+    def reverse_postorder(self):
+        if self._order is None:
+            order = []
+            if len(self):
+                visited = bytearray(len(self))
+                visited[0] = 1
+                stack = [(0, iter(self.successors[0]))]
+                while stack:
+                    b, following = stack[-1]
+                    for s in following:
+                        if not visited[s]:
+                            visited[s] = 1
+                            stack.append((s, iter(self.successors[s])))
+                            break
+                    else:
+                        stack.pop()
+                        order.append(b)
+            order.reverse()
+            self._order = order
+        return self._order
+
+    # idom[b]: the immediate dominator of block b (the first block is its
+    # own, unreachable blocks have -1), by the algorithm of Cooper, Harvey
+    # and Kennedy: a few passes in reverse postorder, walking up the
+    # dominator tree from the predecessors until they meet
+    def dominators(self):
+        if self._idom is None:
+            order = self.reverse_postorder()
+            rank = array('l', [-1]) * len(self)
+            for k, b in enumerate(order):
+                rank[b] = k
+            idom = array('l', [-1]) * len(self)
+            if order:
+                idom[order[0]] = order[0]
+            changed = True
+            while changed:
+                changed = False
+                for b in order[1:]:
+                    new = -1
+                    for p in self.predecessors[b]:
+                        if idom[p] == -1:
+                            continue
+                        if new == -1:
+                            new = p
+                            continue
+                        while p != new:
+                            while rank[p] > rank[new]:
+                                p = idom[p]
+                            while rank[new] > rank[p]:
+                                new = idom[new]
+                    if idom[b] != new:
+                        idom[b] = new
+                        changed = True
+            self._idom = idom
+        return self._idom
+
+    # whether block a dominates block b
+    def dominates(self, a, b):
+        idom = self.dominators()
+        if idom[b] == -1:
+            return False
+        while b != a:
+            if idom[b] == b:
+                return False
+            b = idom[b]
+        return True
+
+
+# Solves a dataflow problem over the blocks of cfg: per block b,
+#   result[b] = gen[b] | (meet[b] & ~kill[b])
+# where meet[b] is the union (the intersection with intersect=True) of the
+# results of the predecessors, or of the successors when forward is False,
+# and of `boundary` for the first block (for the exits when backward).
+# universe is the set of all the bits, where an intersection starts.
+# Returns the lists meet and result: for a backward problem the meet is
+# the value at the end of the block and the result the one at its start.
+def solve(cfg, gen, kill, forward=True, intersect=False, boundary=0, universe=0):
+    count = len(cfg)
+    order = list(cfg.reverse_postorder())
+    if len(order) < count:
+        reached = bytearray(count)
+        for b in order:
+            reached[b] = 1
+        order += [b for b in range(count) if not reached[b]]
+    if forward:
+        sources = cfg.predecessors
+        targets = cfg.successors
+        boundaries = bytearray(count)
+        if count:
+            boundaries[0] = 1
+    else:
+        order.reverse()
+        sources = cfg.successors
+        targets = cfg.predecessors
+        boundaries = cfg.exits
+    rank = array('l', [0]) * count
+    for k, b in enumerate(order):
+        rank[b] = k
+    meet = [0] * count
+    result = [universe if intersect else 0] * count
+    changed = bytearray(b'\1') * count
+    again = True
+    while again:
+        again = False
+        for b in order:
+            if not changed[b]:
+                continue
+            changed[b] = 0
+            if intersect:
+                value = boundary if boundaries[b] else universe
+                for s in sources[b]:
+                    value &= result[s]
+            else:
+                value = boundary if boundaries[b] else 0
+                for s in sources[b]:
+                    value |= result[s]
+            meet[b] = value
+            value = gen[b] | (value & ~kill[b])
+            if value != result[b]:
+                result[b] = value
+                for t in targets[b]:
+                    changed[t] = 1
+                    if rank[t] <= rank[b]:
+                        again = True
+    return meet, result
+
+
+# Reaching definitions: the instructions assigning a result, numbered in
+# order.  Returns (definitions, reach_in, reach_out), the sets of the
+# definitions reaching the start and the end of every block.
+def reaching_definitions(quadruples, cfg):
+    result = quadruples.result
+    definitions = []
+    of_name = {}
+    for i in range(len(quadruples)):
+        if result[i] is not None:
+            of_name[result[i]] = of_name.get(result[i], 0) | (1 << len(definitions))
+            definitions.append(i)
+    gen = []
+    kill = []
+    k = 0
+    for b in range(len(cfg)):
+        generated = killed = 0
+        for i in range(cfg.start[b], cfg.end[b]):
+            if result[i] is not None:
+                mine = of_name[result[i]]
+                generated = (generated & ~mine) | (1 << k)
+                killed |= mine
+                k += 1
+        gen.append(generated)
+        kill.append(killed & ~generated)
+    reach_in, reach_out = solve(cfg, gen, kill)
+    return definitions, reach_in, reach_out
+
+
+# Liveness of the names for which tracked(name) is true (all of them by
+# default): returns (bit, live_in, live_out), bit being the number of the
+# bit of every name.
+def liveness(quadruples, cfg, tracked=None):
+    arg1 = quadruples.arg1
+    arg2 = quadruples.arg2
+    result = quadruples.result
+    bit = {}
+    for i in range(len(quadruples)):
+        for name in (arg1[i], arg2[i], result[i]):
+            if name is not None and name not in bit and (tracked is None or tracked(name)):
+                bit[name] = len(bit)
+    gen = []
+    kill = []
+    for b in range(len(cfg)):
+        used = defined = 0
+        for i in range(cfg.end[b] - 1, cfg.start[b] - 1, -1):
+            if result[i] in bit:
+                mask = 1 << bit[result[i]]
+                used &= ~mask
+                defined |= mask
+            if arg1[i] in bit:
+                used |= 1 << bit[arg1[i]]
+            if arg2[i] in bit:
+                used |= 1 << bit[arg2[i]]
+        gen.append(used)
+        kill.append(defined)
+    live_out, live_in = solve(cfg, gen, kill, forward=False)
+    return bit, live_in, live_out
+
+
+# Available expressions: the arithmetic operations (op, arg1, arg2)
+# computed on every path to a point and not invalidated since by an
+# assignment to one of their operands.  Returns (expressions, avail_in,
+# avail_out).
+def available_expressions(quadruples, cfg):
+    ops = quadruples.op
+    arg1 = quadruples.arg1
+    arg2 = quadruples.arg2
+    result = quadruples.result
+    bit = {}
+    using = {}
+    for i in range(len(quadruples)):
+        if ops[i] in ARITHMETIC_OPS or ops[i] == 'neg':
+            expression = (ops[i], arg1[i], arg2[i])
+            if expression not in bit:
+                bit[expression] = len(bit)
+                for name in (arg1[i], arg2[i]):
+                    if name is not None:
+                        using[name] = using.get(name, 0) | (1 << bit[expression])
+    gen = []
+    kill = []
+    for b in range(len(cfg)):
+        available = killed = 0
+        for i in range(cfg.start[b], cfg.end[b]):
+            if ops[i] in ARITHMETIC_OPS or ops[i] == 'neg':
+                available |= 1 << bit[(ops[i], arg1[i], arg2[i])]
+            if result[i] is not None:
+                mine = using.get(result[i], 0)
+                available &= ~mine
+                killed |= mine
+        gen.append(available)
+        kill.append(killed)
+    universe = (1 << len(bit)) - 1
+    avail_in, avail_out = solve(cfg, gen, kill, intersect=True, universe=universe)
+    return list(bit), avail_in, avail_out
@@ -0,0 +1,151 @@
+# Instrumentation of compiles, off unless a session is given a Profile.
+#
+# A compile without a Profile runs no instrumentation code at all.  With
+# one, the session parses with a copy of the parser whose productions call
+# timed wrappers of the grammar actions, takes its tokens through a timed
+# function and backpatches and merges through counting versions of its
+# backpatch and merge; all of it only for that compile.
+#
+# A Profile collects, over all the compiles it is given to:
+#
+#   phases     seconds of lex, parse (the parser and the grammar actions,
+#              without lex and backpatch), backpatch, optimize,
+#              declarations and emit (the last two when the C text is
+#              generated)
+#   rules      per production: reductions and seconds (including the
+#              backpatches done by the action)
+#   counters   compiles, tokens, backpatches, backpatched jumps, merges
+#   peaks      the most quadruples and temps of a compile
+#
+# token(), reduction(), backpatched() and merged() are called as things
+# happen: a subclass can extend them to trace a compile.
+
+import copy
+import json
+from time import perf_counter
+
+from ir import instructions, merge
+
+PHASES = ('lex', 'parse', 'backpatch', 'optimize', 'declarations', 'emit')
+
+
+class Profile:
+    def __init__(self):
+        self.phases = dict.fromkeys(PHASES, 0.0)
+        self.rules = {}
+        self.counters = {'compiles': 0, 'tokens': 0, 'backpatches': 0,
+                         'backpatched_jumps': 0, 'merges': 0}
+        self.peaks = {'quadruples': 0, 'temps': 0}
+        self.started = None
+
+    # --- Hooks
+
+    def token(self, token, seconds):
+        self.phases['lex'] += seconds
+        if token is not None:
+            self.counters['tokens'] += 1
+
+    def reduction(self, rule, seconds):
+        stats = self.rules.get(rule)
+        if stats is None:
+            stats = self.rules[rule] = [0, 0.0]
+        stats[0] += 1
+        stats[1] += seconds
+
+    def backpatched(self, jumps, seconds):
+        self.phases['backpatch'] += seconds
+        self.counters['backpatches'] += 1
+        self.counters['backpatched_jumps'] += jumps
+
+    def merged(self):
+        self.counters['merges'] += 1
+
+    def phase(self, name, seconds):
+        self.phases[name] += seconds
+
+    # --- Setting up a compile
+
+    # returns the parser and the token function the session parses with
+    def instrument(self, session, parser, lexer):
+        parser = copy.copy(parser)
+        parser.productions = [self.instrument_production(production)
+                              for production in parser.productions]
+
+        backpatch = session.quadruples.backpatch
+
+        def timed_backpatch(plist, label):
+            jumps = sum(1 for i in instructions(plist))
+            start = perf_counter()
+            backpatch(plist, label)
+            self.backpatched(jumps, perf_counter() - start)
+
+        def counted_merge(l1, l2):
+            self.merged()
+            return merge(l1, l2)
+
+        session.backpatch = timed_backpatch
+        session.merge = counted_merge
+
+        token = lexer.token
+
+        def timed_token():
+            start = perf_counter()
+            result = token()
+            self.token(result, perf_counter() - start)
+            return result
+
+        self.started = (perf_counter(), self.phases['lex'], self.phases['backpatch'])
+        return parser, timed_token
+
+    def instrument_production(self, production):
+        action = production.callable
+        if action is None:
+            return production
+        production = copy.copy(production)
+        rule = production.str
+        reduction = self.reduction
+
+        def timed_action(p):
+            start = perf_counter()
+            action(p)
+            reduction(rule, perf_counter() - start)
+
+        production.callable = timed_action
+        return production
+
+    # called when the parser is done with the session
+    def parsed(self, session):
+        start, lex, backpatch = self.started
+        seconds = perf_counter() - start
+        seconds -= (self.phases['lex'] - lex) + (self.phases['backpatch'] - backpatch)
+        self.phases['parse'] += seconds
+        self.counters['compiles'] += 1
+        self.peaks['quadruples'] = max(self.peaks['quadruples'], len(session.quadruples))
+        self.peaks['temps'] = max(self.peaks['temps'], len(session.temp_var_names))
+
+    # --- Results
+
+    def as_dict(self):
+        rules = sorted(self.rules.items(), key=lambda item: item[1][1], reverse=True)
+        return {'phases': dict(self.phases),
+                'rules': {rule: {'reductions': count, 'seconds': seconds}
+                          for rule, (count, seconds) in rules},
+                'counters': dict(self.counters),
+                'peaks': dict(self.peaks)}
+
+    def to_json(self):
+        return json.dumps(self.as_dict(), indent=2)
+
+    # adds the results of another profile (as_dict() of it, as worker
+    # processes send them)
+    def add(self, results):
+        for name, seconds in results['phases'].items():
+            self.phases[name] += seconds
+        for rule, stats in results['rules'].items():
+            mine = self.rules.setdefault(rule, [0, 0.0])
+            mine[0] += stats['reductions']
+            mine[1] += stats['seconds']
+        for name, count in results['counters'].items():
+            self.counters[name] += count
+        for name, peak in results['peaks'].items():
+            self.peaks[name] = max(self.peaks[name], peak)
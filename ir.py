@@ -0,0 +1,184 @@
+# Intermediate representation of the generated code.
+#
+# Every instruction is a quadruple (op, arg1, arg2, result) plus a jump
+# target.  The fields live in parallel arrays so that an instruction is just
+# an index, a backpatch is a single integer store into `target` and the C
+# text is only produced once, at emit time.
+#
+#   op              meaning
+#   + - * / %       result = arg1 op arg2
+#   << >> &         result = arg1 op arg2 (from the strength reduction of
+#                   optimize.py, >> of a negative int shifts its sign in)
+#   neg             result = -arg1
+#   :=              result = arg1
+#   < <= > >= = <>  if arg1 op arg2 goto target
+#   goto            goto target
+#   switch          jump table on arg1 (the value), made of the case and
+#                   default instructions following it:
+#   case            if value = arg1 goto target
+#   default         goto target, the end of the table
+#   print           print arg1
+
+from array import array
+
+ARITHMETIC_OPS = ('+', '-', '*', '/', '%', '<<', '>>', '&')
+RELATIONAL_OPS = ('<', '<=', '>', '>=', '=', '<>')
+JUMP_OPS = RELATIONAL_OPS + ('goto', 'case', 'default')
+# the jumps which never go on to the next instruction
+GOTO_OPS = ('goto', 'default')
+
+# how the relational operators of our language are spelled in C
+C_RELOPS = {'<': '<', '<=': '<=', '>': '>', '>=': '>=', '=': '==', '<>': '!='}
+
+# target of a jump which is not backpatched yet
+NO_TARGET = -1
+
+
+def is_constant(operand):
+    # constants are kept as their source text ('5', '3.14', '-2')
+    return operand[0].isdigit() or (operand[0] == '-' and operand[1:2].isdigit())
+
+
+# whether an operand is a real: one of the names of `reals` (the real
+# variables and temps) or a real constant
+def is_real(operand, reals):
+    return operand in reals or (is_constant(operand) and '.' in operand)
+
+
+# Truelists, falselists and nextlists are patch lists: a leaf holds one
+# instruction and an inner node is the concatenation of its two children.
+# `None` is the empty list.  Merging only allocates one node, so a chain of
+# n && or || costs O(n); the instructions are collected when the list is
+# backpatched.
+class PatchList:
+    __slots__ = ('instr', 'left', 'right')
+
+    def __init__(self, instr, left=None, right=None):
+        self.instr = instr
+        self.left = left
+        self.right = right
+
+
+def makelist(i):
+    return PatchList(i)
+
+
+def merge(l1, l2):
+    if l1 is None:
+        return l2
+    if l2 is None:
+        return l1
+    return PatchList(None, l1, l2)
+
+
+# yields the instructions of a patch list (without recursion, merged
+# lists of long boolean chains are very deep)
+def instructions(plist):
+    stack = [plist]
+    while stack:
+        node = stack.pop()
+        if node is None:
+            continue
+        if node.instr is not None:
+            yield node.instr
+        else:
+            stack.append(node.right)
+            stack.append(node.left)
+
+
+class Quadruples:
+    __slots__ = ('op', 'arg1', 'arg2', 'result', 'target')
+
+    def __init__(self):
+        self.op = []
+        self.arg1 = []
+        self.arg2 = []
+        self.result = []
+        self.target = array('l')
+
+    def __len__(self):
+        return len(self.op)
+
+    def __iter__(self):
+        return zip(self.op, self.arg1, self.arg2, self.result, self.target)
+
+    def nextinstr(self):
+        return len(self.op)
+
+    # nextinstr() for a position which may become a jump target (see
+    # stream.py, which labels these positions as it writes them)
+    def mark(self):
+        return len(self.op)
+
+    # appends an instruction and returns its index
+    def append(self, op, arg1=None, arg2=None, result=None, target=NO_TARGET):
+        self.op.append(op)
+        self.arg1.append(arg1)
+        self.arg2.append(arg2)
+        self.result.append(result)
+        self.target.append(target)
+        return len(self.op) - 1
+
+    # fills the target of every jump in the patch list with `label`
+    def backpatch(self, plist, label):
+        target = self.target
+        for i in instructions(plist):
+            target[i] = label
+
+    # the set of instructions which are jumped to; a target equal to
+    # len(self) is the end of the program
+    def labels(self):
+        labels = set(self.target)
+        labels.discard(NO_TARGET)
+        return labels
+
+    def c_line(self, i, reals=()):
+        return c_statement(self.op[i], self.arg1[i], self.arg2[i], self.result[i],
+                           label_name(self.target[i]), reals)
+
+    # generates the C text of the instructions, one line per instruction
+    # (plus a final labelled empty statement when the end of the program
+    # is jumped to); reals are the names of the real variables and temps
+    def emit(self, reals=()):
+        labels = self.labels()
+        lines = []
+        for i in range(len(self.op)):
+            line = self.c_line(i, reals)
+            if i in labels:
+                line = label_name(i) + ': ' + line
+            lines.append(line)
+        if len(self.op) in labels:
+            lines.append(label_name(len(self.op)) + ': ;')
+        return lines
+
+
+# the C statement of one instruction, `label` is the spelling of its target
+# and reals the names of the real variables and temps
+def c_statement(op, arg1, arg2, result, label, reals=()):
+    if op in RELATIONAL_OPS:
+        return 'if (%s %s %s) goto %s;' % (arg1, C_RELOPS[op], arg2, label)
+    elif op == 'goto':
+        return 'goto %s;' % label
+    elif op == 'switch':
+        return 'switch (%s) {' % arg1
+    elif op == 'case':
+        return 'case %s: goto %s;' % (arg1, label)
+    elif op == 'default':
+        return 'default: goto %s; }' % label
+    elif op in ARITHMETIC_OPS:
+        return '%s = %s %s %s;' % (result, arg1, op, arg2)
+    elif op == 'neg':
+        return '%s = -%s;' % (result, arg1)
+    elif op == ':=':
+        return '%s = %s;' % (result, arg1)
+    elif op == 'print':
+        if is_real(arg1, reals):
+            return 'printf("%%f\\n", %s);' % arg1
+        return 'printf("%%d\\n", %s);' % arg1
+    raise ValueError('unknown operation %r' % op)
+
+
+def label_name(i):
+    if i == NO_TARGET:
+        return '_'
+    return 'l' + str(i)
@@ -1,5 +1,16 @@
-from ply.lex import lex
-from ply.yacc import yacc
+import copy
+import mmap
+import os
+import sys
+import threading
+import time
+
+from ir import Quadruples, is_constant, is_real, makelist, merge
+from nodes import Assign, BinOp, Block, If, Neg, Print, Program, Switch, While
+from symbols import SymbolTable
+
+# optimize.py, scanner.py, stream.py and vm.py are imported where they are
+# used, like ply, so importing this module stays cheap
 
 # --- Tokenizer
 
@@ -33,7 +44,7 @@ tokens = (
         )
 
 # Ignored characters
-t_ignore = ' \t\n'
+t_ignore = ' \t'
 
 # Token matching rules are written as regexs
 # punctuations
@@ -56,35 +67,20 @@ t_EQ = '='
 t_GL = '<>'
 # assignment
 t_ASSIGN = ':='
-# define tokens associated to keywords defined eariler
-t_IF = 'if'
-t_THEN = 'then'
-t_WHILE = 'while'
-t_ELSE = 'else'
-t_DO = 'do'
-t_PRINT = 'print'
-t_OF = 'of'
-t_PROGRAM = 'program'
-t_VAR = 'var'
-t_BEGIN = 'begin'
-t_END = 'end'
 # Delimeters
 t_LPAREN = r'\('
 t_RPAREN = r'\)'
-t_UMINUS = r'-'
 # Boolean
 t_AND = '&&'
 t_NOT = '!'
-t_OR = '\|\|'
-# types
-t_REAL = 'real'
-t_INT = 'int'
-
-# keywords if, then, while, else, do, print, of, program, begin, end, and default
-# are tokens which should not be considered as an identifier
-# so we omit them
+t_OR = r'\|\|'
+
+# keywords (and the type names) are matched as identifiers and then
+# looked up in `reserved` (shared with scanner.py, imported by
+# get_lexer()), so the master regex has a single rule for all of them
 def t_IDENTIFIER(t):
-    r'\b(?!(if|then|while|else|do|print|of|program|begin|end|var|int|real)\b)[a-zA-Z_][a-zA-Z0-9_]*'
+    r'[a-zA-Z_][a-zA-Z0-9_]*'
+    t.type = reserved.get(t.value, 'IDENTIFIER')
     return t
 
 # Function to generate relational operation tokens
@@ -93,185 +89,88 @@ def t_IDENTIFIER(t):
 #     r'<|<=|>|>=|=|<>'
 #     return t
 
-# A function used for genrate token for integer constants
-def t_CONSTINT(t):
-    r'[+]?[0-9]+'
-    return t
-
 # A function used for genrate token for real constants
+# (before the integers, or 3.14 would be read as 3 and an illegal '.')
 def t_CONSTREAL(t):
-    r'[+]?[0-9]+\.[0-9]+'
-    t.value = int(t.value)
+    r'[0-9]+\.[0-9]+'
+    return t
+
+# A function used for genrate token for integer constants
+def t_CONSTINT(t):
+    r'[0-9]+'
     return t
 
 # Ignored token with an action associated with it
-# def t_ignore_newline(t):
-#     r'\n+'
-#     t.lexer.lineno += t.value.count('\n')
+def t_ignore_newline(t):
+    r'\n+'
+    t.lexer.lineno += t.value.count('\n')
 
 # Error handler for illegal characters
 def t_error(t):
-    print(f'Illegal character {t.value[0]!r}')
+    t.lexer.session.errors.append(f'Illegal character {t.value[0]!r} '
+                                  f'(line {t.lineno}, column {find_column(t)})')
     t.lexer.skip(1)
 
-# Build the lexer object
-lexer = lex()
-
 # --- Parser
 
 
 # For Every Expression we have : expression(truelist, falselist)
-# Then to Show Truelist, We Show like P[i][0] and for False is P[i][1]
+# both are patch lists (see ir.py)
 
 class E:
+    __slots__ = ('truelist', 'falselist')
+
     def __init__(self, t, f):
         self.truelist = t
         self.falselist = f
 
+# the E of an expression used as a condition (by if, while, ! && ||): an
+# arithmetic expression is an error, and an E with empty lists takes its
+# place so the parse goes on
+def condition(session, expr, line):
+    if isinstance(expr, E):
+        return expr
+    session.errors.append(f'Boolean expression expected (line {line})')
+    return E(None, None)
+
 # S.nextlist is a list
 # of all conditional and unconditional jumps to the instruction following the code
 # for statement S in execution order
 
 class S:
+    __slots__ = ('nextlist',)
+
     def __init__(self, n):
         self.nextlist = n
 
 
-quadruples = ['#include <stdio.h>']
-# List of primary_variables
-primary_var_names = []
-# list of temp variables which used in expressions
-temp_var_names = []
-
-def replace_in_quadruple(l, i):
-    for line_number in l:
-        replaced_line = quadruples[line_number - 1].replace("_", 'l'+str(i))
-        quadruples[line_number - 1] = replaced_line    
-
-# tl_or_fl is for checking false list or truelists (traversal)
-def backpatch(l, i, tl_or_fl):
-        if (type(l) == list):
-            replace_in_quadruple(l, i)
-        elif isinstance(l, E):
-            if tl_or_fl == False:
-                child = l.falselist
-            else:
-                child = l.truelist    
-            
-            while type(child) != list:
-                if tl_or_fl == False:
-                    child = child.falselist
-                else:
-                    child = child.truelist
-            
-            replace_in_quadruple(child, i)
-        elif isinstance(l, S):
-            while type(l) != list:
-                l = l.nextlist
-            replace_in_quadruple(l, i)
-        content = quadruples[i - 1]
-        quadruples[i - 1] = 'l' + str(i) +': ' + content                  
-                #print(line_number, i)
-        #print(quadruples)
-
-# function for merging truelist or falselist of expressions       
-def merge(E_obj1, E_obj2, tl_or_fl: bool):
-    # tl_or_fl as we did in backpatch function, is a flag
-    # for checking truelist or falselists
-    if tl_or_fl == False:
-        # merging two falselists when 
-        # there is no NOT boolean expression
-        if type(E_obj1) != list:
-            false_l1 = E_obj1.falselist
-            while (type(false_l1) != list):
-                false_l1 = false_l1.falselist
-        else:
-            # for NOT expression
-            false_l1 = E_obj1
-        if type(E_obj2)!= list:
-            false_l2 = E_obj2.falselist
-            while (type(false_l2)!= list):
-                false_l2 = false_l2.falselist
-        else:
-            # for NOT expression
-            false_l2 = E_obj2
-        # merge two lists in a new list and return
-        # as the falselist of a new object of E class        
-        temp = false_l1 + false_l2
-        return E([], temp)
-    else:
-        # merging two truelists
-        if type(E_obj1)!= list:
-            true_l1 = E_obj1.truelist
-            while (type(true_l1) != list):
-                true_l1 = true_l1.truelist
-        else:
-            # for NOT expression
-            true_l1 = E_obj1
-        if type(E_obj2)!= list:
-            true_l2 = E_obj2.truelist
-            while (type(true_l2)!= list):
-                true_l2 = true_l2.truelist
-        else:
-            # for NOT expression
-            true_l2 = E_obj2  
-         # merge two lists in a new list and return
-        # as the truelist of a new object of E class                
-        temp = true_l1 + true_l2
-        return E(temp, [])  
-
-def nextinstr():
-    return len(quadruples) + 1
-    #
 def p_marker(p):
     'marker : '
-    p[0] = nextinstr()
+    session = p.parser.session
+    p[0] = session.mark()
 
 def p_n(p):
     'n : '
+    session = p.parser.session
     # N.nlist = makelist(next)
-    p[0] = S([nextinstr()])
-    quadruples.append('goto _')
-
-# this merge is for if statement (without else)
-# which merges the falselist of the boolean expression
-# after 'if' with the nextlist of statement which
-# should jumped into when the boolean expression is false
-def merge_falselist_with_nextlist(falselist, nextlist):
-    #S_next_list = S()
-    if type(falselist) != list:
-        false_l = falselist.falselist
-        while (type(false_l) != list):
-            false_l = false_l.falselist
-    else:
-        
-        false_l = falselist
-    if type(nextlist)!= list:
-        next_l = nextlist.nextlist
-        while (type(next_l)!= list):
-            next_l = next_l.nextlist
-    else:
-            # for NOT expression
-        next_l = nextlist
-        # merge two lists in a new list and return
-        # as the falselist of a new object of E class        
-    temp = false_l + next_l
-    return S(temp)    
-
-def merge_nextlists(s1_nlist, s2_nlist, n_nlist):
-    while (type(s1_nlist) != list and
-     type(s2_nlist) != list and type(n_nlist) != list):
-        s1_nlist = s1_nlist.nextlist
-        s2_nlist = s2_nlist.nextlist
-        n_nlist = n_nlist.nextlist
-    return s1_nlist + s2_nlist + n_nlist   
+    p[0] = S(makelist(session.nextinstr()))
+    session.quadruples.append('goto')
 
 def p_program(p):
     '''program : PROGRAM IDENTIFIER declarations compoundStatement
     '''
-    if len(p) == 5:
+    session = p.parser.session
+    # jumps out of the last statement go to the end of the program
+    session.backpatch(nextlist_of(p[4]), session.mark())
+    session.program_name = p[2]
+    if len(p[3]) != 0:
+        session.declar_list = p[3][1]
+    if session.ast_mode == 'compact':
+        p[0] = Program(p[2], p[3], p[4])
+    elif session.ast_mode == 'tuple':
         p[0] = (p[1], p[2], p[3], p[4])
-    print("p[4] program: ",p[4])    
+    else:
+        p[0] = (p[1], p[2], p[3], None)
 
     #pass
 def p_declarations(p):
@@ -279,9 +178,18 @@ def p_declarations(p):
         declarations : VAR declarationList
                      |
     '''
+    session = p.parser.session
     if len(p) == 3:
         p[0] = (p[1], p[2])
-        print('declar_list: ', p[2])
+        # the symbol table, before the statements using it are parsed
+        positions = iter(session.declared_at)
+        for names, colon, type in p[2]:
+            for name in names:
+                line, column = next(positions)
+                if session.symbols.declare(name, type) is None:
+                    session.errors.append(f'Variable {name!r} declared twice '
+                                          f'(line {line}, column {column})')
+        session.declared_at = []
     elif len(p) == 1:
         p[0] = ()
     #pass
@@ -296,7 +204,8 @@ def p_declarationList(p):
         p[0] = [(p[1], p[2], p[3])]
     elif len(p) == 6:
         #case for the second part of the rule
-        p[0] = p[1] + [(p[3], p[4], p[5])]
+        p[1].append((p[3], p[4], p[5]))
+        p[0] = p[1]
     
     #pass
 
@@ -307,6 +216,8 @@ def p_identifierList(p):
     '''
     # Changed to COMMA token
     # Actually p[0] will store list of identifiers#
+    # (and the session the position of every identifier, in order)
+    p.parser.session.declared_at.append((p.lineno(len(p) - 1), find_column(p.slice[len(p) - 1])))
     if len(p) == 2:
         # when we have only one identifier
         p[0] = [p[1]]
@@ -314,7 +225,8 @@ def p_identifierList(p):
         # when there's several identifiers
         # which is separated with commas, p[1] which is the new
         # one, is append to the list of identifiers
-        p[0] = p[1] + [p[3]]
+        p[1].append(p[3])
+        p[0] = p[1]
 
 #define the type (integers or real numbers)
 def p_type(p):
@@ -332,90 +244,93 @@ def p_compoundStatement(p):
     '''
     compoundStatement : BEGIN statementList END
     '''
+    session = p.parser.session
     #p[0] = (p[1], p[2], p[3])
     
     # S.nlist = L.nlist;
-    p[0] = (S(p[2][0].nextlist), p[1], p[3])
+    if session.ast_mode == 'tuple':
+        p[0] = (S(nextlist_of(p[2])), p[1], p[3])
+    else:
+        p[0] = p[2]
 
+# nextlist of a statement (or statement list), whatever the ast_mode
+def nextlist_of(statement):
+    if type(statement) == tuple:
+        return statement[0].nextlist
+    return statement.nextlist
 
 def p_statementList(p):
     '''
     statementList : statement
                   | statementList SEMICOLON marker statement
     '''
+    session = p.parser.session
     # actually p[0] will store list of statements
     # L -> S
     if len(p) == 2:
         # when we have only one statement
         # L.nlist = S.nlist
-        statement_ = p[1][1:]
-        p[0] = (S(p[1][0].nextlist), [(statement_)])
-        #quadruples.append(str(p[0]) + " : " + str(p[1]))
+        if session.ast_mode == 'tuple':
+            p[0] = (S(nextlist_of(p[1])), [p[1][1:]])
+        elif session.ast_mode == 'compact':
+            p[0] = Block(p[1].nextlist, [p[1]])
+        else:
+            p[0] = p[1]
     # L -> L1 ; M S 
     elif len(p) == 5:
         # when in the compound statement there's several statements
         # which is separated with semicolons, p[1] which is the new
-        # one, is append to the list of statements
+        # one, is append to the list of statements (in place, the
+        # list is not copied)
         
         # backpatch(L1.nlist, M.quad)
-        # print(str(p[1][0].nextlist) + '!!!!!!!!!!!!!!!!!!!!!!!!')
-        backpatch(p[1][0].nextlist, p[3], True)
+        session.backpatch(nextlist_of(p[1]), p[3])
         # L.nlist = S.nlist;
-        # print(p[4][0].nextlist)
-        statement_ = p[4][1:]
-        statement_list_ = p[1][1]
-        #print("st-list: ", statement_list_)
-        p[0] = (S(p[4][0].nextlist), statement_list_ + [(statement_)])
-        # print(p[4][0].nextlist)
-             
-        #quadruples.append(str(p[1]) + " ; " + str(p[4]))
-
-def check_type_of_operand_assignment(op):
-    if type(op) == tuple:
-        return temp_var_names[len(temp_var_names) - 1]
-    elif isinstance(op, E):
-        print(op.truelist)
-        return 'false'
-    else:
-        return str(op)            
+        if session.ast_mode == 'tuple':
+            p[1][1].append(p[4][1:])
+            p[0] = (S(nextlist_of(p[4])), p[1][1])
+        else:
+            if session.ast_mode == 'compact':
+                p[1].statements.append(p[4])
+            p[1].nextlist = p[4].nextlist
+            p[0] = p[1]
 
 # here we have statement rules
 def p_statement_assignment(p):
     '''
     statement : IDENTIFIER ASSIGN expression
     '''
-    arithmetic_symbols = ['+', '*', '-', '/', '%']
+    session = p.parser.session
+    name = session.variable(p[1], p.lineno(1))
     # first part of assignment is a nextlist which firstly
     # points to a blank list 
-    p[0] = (S([]), p[1], p[2], p[3])
-    # when an aritmetic expression
-    if p[3] in arithmetic_symbols:
-        last = quadruples[len(quadruples) - 1]
-        print("last: ", last)
+    if session.ast_mode == 'tuple':
+        p[0] = (S(None), name, p[2], p[3])
+    elif session.ast_mode == 'compact':
+        p[0] = Assign(None, name, p[3])
     else:
-        primary_var_names.append('iid_' + str(len(primary_var_names)+ 1))
-        print('salam ', p[3])
-        quadruples.append(p[1] + ' = ' + check_type_of_operand_assignment(p[3]) + ';')
-        return   
-    id_end_index = last.find(" =")
-    #print("index: ", id_end_index)
-    #last = last.replace('=', p[2])
-    #print("string: ", last)
-    quadruples[len(quadruples) - 1] = p[1] + last[id_end_index:] + ';'
-    #pass
+        p[0] = S(None)
+    session.quadruples.append(':=', session.operand(p[3]), result=name)
 
 def p_statement_if(p):
     '''
     statement : IF expression THEN marker statement
               | IF expression THEN marker statement n ELSE marker statement
     '''
+    session = p.parser.session
+    p[2] = condition(session, p[2], p.lineno(1))
     # S -> if E then M S1
     if len(p) == 6:
         # backpatch(E.tlist, M.quad)
-        backpatch(p[2], p[4], True)
+        session.backpatch(p[2].truelist, p[4])
         # S.nlist = merge(E.flist, S1.nlist)
-        nextlist = merge_falselist_with_nextlist(p[2].falselist, p[5][0].nextlist)
-        p[0] = (S(nextlist), 'if', p[2], p[5])
+        nextlist = session.merge(p[2].falselist, nextlist_of(p[5]))
+        if session.ast_mode == 'tuple':
+            p[0] = (S(nextlist), 'if', p[2], p[5])
+        elif session.ast_mode == 'compact':
+            p[0] = If(nextlist, p[2], p[5])
+        else:
+            p[0] = S(nextlist)
         #quadruples.append()
 
     # S -> if E then M1 S1 n else M2 S2
@@ -423,35 +338,133 @@ def p_statement_if(p):
         #p[0] = ('if-else', (p[2], p[4], p[6]))
         
         # backpatch(E.tlist, M1.quad)    
-        backpatch(p[2], p[4], True)
+        session.backpatch(p[2].truelist, p[4])
         # backpatch(E.flist, M2.quad)
-        backpatch(p[2], p[8], False)
-        
-        nextlist = merge_nextlists(p[5][0].nextlist, p[9][0].nextlist,
-            p[6].nextlist)
-        p[0] = (S(nextlist), 'if-else', p[2], p[5], p[9])
+        session.backpatch(p[2].falselist, p[8])
+        # S.nlist = merge(S1.nlist, N.nlist, S2.nlist)
+        nextlist = session.merge(session.merge(nextlist_of(p[5]), p[6].nextlist),
+            nextlist_of(p[9]))
+        if session.ast_mode == 'tuple':
+            p[0] = (S(nextlist), 'if-else', p[2], p[5], p[9])
+        elif session.ast_mode == 'compact':
+            p[0] = If(nextlist, p[2], p[5], p[9])
+        else:
+            p[0] = S(nextlist)
 
 
 def p_statement_while(p):
     '''
     statement : WHILE marker expression DO marker statement
     '''
+    session = p.parser.session
+    p[3] = condition(session, p[3], p.lineno(1))
     # backpatch(S.nextlist, M1.quad)
     #print(p[6][0].nextlist)
-    backpatch(p[6][0].nextlist, p[2], True)
+    session.backpatch(nextlist_of(p[6]), p[2])
     # backpatch(E.truelist, M2.quad)
-    backpatch(p[3], p[5], True)
-    nextlist = p[3].falselist
-    p[0] = (S(nextlist), p[1], p[3], p[4], p[6])
-    quadruples.append('goto l' + str(p[2]))
+    session.backpatch(p[3].truelist, p[5])
+    # S.nlist = E.flist
+    if session.ast_mode == 'tuple':
+        p[0] = (S(p[3].falselist), p[1], p[3], p[4], p[6])
+    elif session.ast_mode == 'compact':
+        p[0] = While(p[3].falselist, p[3], p[6])
+    else:
+        p[0] = S(p[3].falselist)
+    session.quadruples.append('goto', target=p[2])
     #pass
 
+# switch E of c1: S1; ...; cn: Sn; default: S done
+#
+# The value of E is computed once and a jump goes over the cases to the
+# tests, which come last so the start of every case is known when they
+# are generated (see CompilerSession.dispatch).  Every case ends with a
+# jump out of the switch; without a default, a value no case has goes
+# there too.
+def p_statement_switch(p):
+    '''
+    statement : switchHead caseList DONE
+              | switchHead caseList SEMICOLON DEFAULT COLON marker statement DONE
+    '''
+    session = p.parser.session
+    expression, value, test = p[1]
+    nextlist = None
+    seen = set()
+    for constant, start, statement, case_nextlist in p[2]:
+        if constant in seen:
+            session.errors.append(f'Duplicate case {constant} in a switch')
+        seen.add(constant)
+        nextlist = session.merge(nextlist, case_nextlist)
+    default = None
+    if len(p) == 9:
+        default = p[6]
+        nextlist = session.merge(nextlist, session.merge(
+            nextlist_of(p[7]), makelist(session.quadruples.append('goto'))))
+    session.backpatch(test, session.mark())
+    cases = [(constant, start) for constant, start, statement, case_nextlist in p[2]]
+    nextlist = session.merge(nextlist, session.dispatch(value, cases, default))
+    if session.ast_mode == 'tuple':
+        p[0] = (S(nextlist), 'switch', expression,
+                [(constant, statement) for constant, start, statement, n in p[2]],
+                p[7] if default is not None else None)
+    elif session.ast_mode == 'compact':
+        p[0] = Switch(nextlist, expression,
+                      [(constant, statement) for constant, start, statement, n in p[2]],
+                      p[7] if default is not None else None)
+    else:
+        p[0] = S(nextlist)
+
+def p_switchHead(p):
+    '''
+    switchHead : SWITCH expression OF
+    '''
+    session = p.parser.session
+    value = session.operand(p[2])
+    if is_real(value, session.symbols.reals):
+        # C switches on ints only
+        session.errors.append(f'Switch on a real value (line {p.lineno(1)})')
+    # the jump to the tests
+    p[0] = (p[2], value, makelist(session.quadruples.append('goto')))
+
+# a list of (constant, first instruction, statement, nextlist)
+def p_caseList(p):
+    '''
+    caseList : case
+             | caseList SEMICOLON case
+    '''
+    if len(p) == 2:
+        p[0] = [p[1]]
+    else:
+        p[1].append(p[3])
+        p[0] = p[1]
+
+def p_case(p):
+    '''
+    case : caseConstant COLON marker statement
+    '''
+    session = p.parser.session
+    # the jump out of the switch after the statement
+    nextlist = session.merge(nextlist_of(p[4]), makelist(session.quadruples.append('goto')))
+    p[0] = (p[1], p[3], p[4], nextlist)
+
+def p_caseConstant(p):
+    '''
+    caseConstant : CONSTINT
+                 | MINUS CONSTINT
+    '''
+    p[0] = int(p[len(p) - 1]) * (-1 if len(p) == 3 else 1)
+
 def p_statement_print(p):
     '''
     statement : PRINT LPAREN expression RPAREN
     '''
-    p[0] = (S([]), p[1], (p[3]))
-    quadruples.append('print ' + p[2] + str(p[3]) + p[4])
+    session = p.parser.session
+    if session.ast_mode == 'tuple':
+        p[0] = (S(None), p[1], (p[3]))
+    elif session.ast_mode == 'compact':
+        p[0] = Print(None, p[3])
+    else:
+        p[0] = S(None)
+    session.quadruples.append('print', session.operand(p[3]))
     #pass
 
 # rules which expression is in the rule's leftside
@@ -473,9 +486,9 @@ def p_expression_IDENTIFIER(p):
     '''
     expression : IDENTIFIER
     '''
+    session = p.parser.session
     # p[0] = ('IDENTIFIER', p[1])
-    p[0] = p[1]
-    primary_var_names.append('iid_' + str(len(primary_var_names) + 1))
+    p[0] = session.variable(p[1], p.lineno(1))
 
 # Write functions for each grammar rule which is
 # specified in the docstring.
@@ -487,6 +500,7 @@ def p_expression_arithmetic(p):
                | expression DIVIDE expression
                | expression MOD expression
     '''
+    session = p.parser.session
     # p is a sequence that represents rule contents.
     #
     # expression : expression arithmetic_operaion expression
@@ -494,28 +508,22 @@ def p_expression_arithmetic(p):
     #
     if (p[2] == '+' or p[2] == '-' or p[2] == '*' 
         or p[2] == '/' or p[2] == '%'):
-        p[0] = (p[1], p[2], p[3])
-        if ((type(p[1]) == tuple or isinstance(p[1], E)) and
-            (type(p[3]) == tuple or isinstance(p[3], E))):
-            op1 = temp_var_names[len(temp_var_names) - 1]
-            op2 = temp_var_names[len(temp_var_names) - 2]
+        op1 = session.operand(p[1])
+        op2 = session.operand(p[3])
+        real = is_real(op1, session.symbols.reals) or is_real(op2, session.symbols.reals)
+        if p[2] == '%' and real:
+            # C has no % of floats
+            session.errors.append(f'Remainder of a real value (line {p.lineno(2)})')
+        # the temp has the type of the operation, a real one if an operand is
+        temp_var_name = session.new_temp(real)
+        if session.ast_mode == 'tuple':
+            p[0] = (p[1], p[2], p[3], temp_var_name)
+        elif session.ast_mode == 'compact':
+            p[0] = BinOp(p[2], p[1], p[3], temp_var_name)
         else:
-            if type(p[1]) == tuple or isinstance(p[1], E):
-                op1 = temp_var_names[len(temp_var_names) - 1]
-            else:
-                op1 = str(p[1])
+            p[0] = temp_var_name
 
-            if type(p[3]) == tuple or isinstance(p[3], E):
-                op2 = temp_var_names[len(temp_var_names) - 1]
-            else:
-                op2 = str(p[3])
-
-        temp_var_name = 'temp_int_' + str(len(temp_var_names) + 1)
-        temp_var_names.append(temp_var_name)
-        
-        quadruples.append(temp_var_name + ' = ' + op1 + p[2] + op2 + ';')
-        print(f'primary_var_names:{primary_var_names}, temps:{temp_var_names}')
-        print(f'quadruples:{quadruples}, p[0]:{p[0]}')
+        session.quadruples.append(p[2], op1, op2, temp_var_name)
 
     # elif p[2] == '-':
     #     p[0] = (p[1], p[2], p[3])
@@ -535,6 +543,7 @@ def p_expr_Relop(p):
                | expression LE expression
                | expression GE expression
     '''
+    session = p.parser.session
     # p is a sequence that represents rule contents.
     #
     # expression : expression relational operaion expression
@@ -543,17 +552,20 @@ def p_expr_Relop(p):
     if (p[2] == '<' or p[2] == '=' or p[2] == '>' or
         p[2] == '<=' or p[2] == '>=' or p[2] == '<>'):
         #p[0] = (p[1], p[2], p[3])
-        truelist = E([nextinstr()], [])
-        falselist = E([], [nextinstr() + 1])
-        p[0] = E(truelist,falselist)
-        quadruples.append(("if " + str(p[1]) + " " + p[2] + " " + str(p[3]) + " " + "goto _"))
-        quadruples.append("goto _")
+        op1 = session.operand(p[1])
+        op2 = session.operand(p[3])
+        p[0] = E(makelist(session.nextinstr()), makelist(session.nextinstr() + 1))
+        session.quadruples.append(p[2], op1, op2)
+        session.quadruples.append('goto')
 
 def p_expr_bool_dual(p):
     '''
     expression : expression AND marker expression
                | expression OR marker expression
     '''
+    session = p.parser.session
+    p[1] = condition(session, p[1], p.lineno(2))
+    p[4] = condition(session, p[4], p.lineno(2))
     # p is a sequence that represents rule contents.
     #
     # expression : expression relativity operaions expression
@@ -562,127 +574,505 @@ def p_expr_bool_dual(p):
     if p[2] == '&&':
         #print("p[1] truelist:", p[1].truelist.truelist)
         #p[0] = (p[1], p[2], p[3])
-        backpatch(p[1], p[3], True)
-        # e_tl = p[3].truelist
-        # e_fl = p[3].falselist
-        # print(f"p[3]:{e_tl.truelist}, {e_tl.falselist}")
-        # print(f"p[3]:{e_fl.truelist}, {e_fl.falselist}")
+        session.backpatch(p[1].truelist, p[3])
         truelist = p[4].truelist
-        # falselist = p[4].falselist + p[1].falselist
-        falselist = merge(p[1].falselist, p[4].falselist, False)
+        falselist = session.merge(p[1].falselist, p[4].falselist)
         p[0] = E(truelist, falselist)
 
     elif p[2] == '||':
         #p[0] = (p[1], p[2], p[3])
-        backpatch(p[1], p[3], False)
-        truelist = merge(p[1].truelist, p[4].truelist, True)
+        session.backpatch(p[1].falselist, p[3])
+        truelist = session.merge(p[1].truelist, p[4].truelist)
         falselist = p[4].falselist
         p[0] = E(truelist, falselist)
 
 
 def p_expr_uminus(p):
     'expression : MINUS expression %prec UMINUS'
+    session = p.parser.session
     #p[0] = ('-',p[2])
-    p[0] = '-' + p[2]
+    op = session.operand(p[2])
+    if is_constant(op):
+        # -(-5) is just 5
+        p[0] = op[1:] if op[0] == '-' else '-' + op
+    else:
+        temp_var_name = session.new_temp(is_real(op, session.symbols.reals))
+        if session.ast_mode == 'tuple':
+            p[0] = ('-', p[2], None, temp_var_name)
+        elif session.ast_mode == 'compact':
+            p[0] = Neg(p[2], temp_var_name)
+        else:
+            p[0] = temp_var_name
+        session.quadruples.append('neg', op, result=temp_var_name)
 
 def p_expression_NOT(p):
     '''
     expression : NOT expression
     '''
+    p[2] = condition(p.parser.session, p[2], p.lineno(1))
     if p[1] == '!':
         #print(f"p[1] = {p[1]}, p[2] = {p[2]}")
         #p[0] = (p[1], p[2])
-        truelist = p[2].falselist
-        falselist = p[2].truelist
-        #print(f"salam truelist:{truelist.falselist}, falselist:{falselist.truelist}")
-        if type(truelist) == list:
-            tl = truelist
-        else:
-            tl = truelist.falselist    
-        if type(falselist) == list:
-            fl = falselist
-        else:
-            fl = falselist.truelist       
-        p[0] = E(tl, fl)
+        p[0] = E(p[2].falselist, p[2].truelist)
 
 def p_expression_grouped(p):
     '''
     expression : LPAREN expression RPAREN
     '''
-    #p[0] = E(p[2].truelist, p[2].falselist)
-    if (isinstance(p[2], E)):
-        p[0] = E(p[2].truelist, p[2].falselist)
-    else:
-        p[0] = (p[2])    
+    p[0] = p[2]
 
 def p_error(p):
-    print(f'Syntax error at {p.value!r}')
-
-# Build the parser
-parser = yacc(start='program')
-
-def insertion_of_declaration_list(list):
-    print('slam insertion')
-    integers = []
-    #reals = []
-    for declare in list:
-        if declare[2] == 'int':
-            integers = integers + declare[0]
-        # else:
-        #     reals = reals + declare[0]
-    # for integer in integers:
-    #     print("integer", integer)
-    # for real in reals:
-    #     print("real", real)
-    index = 1
-    if len(integers) != 0:
-        string = 'int '
-        for i in range(len(integers) - 1):
-            string += 'iid_' + str(i + 1) + ', '
-        string += 'iid_' + str(len(integers)) + ';'
-        #print(string)
-        quadruples.insert(index, string)
-        
-    # if len(reals) != 0:
-    #     string = 'float '
-    #     for i in range(len(reals) - 1):
-    #         string += 'iid_' + str(i + 1) + ', '
-    #     string += 'iid_' + str(len(reals)) + ';'
-    #     #print(string)
-    #     quadruples.insert(index, string)
-    #     index += 1
-    string = 'int '
-    for temp in temp_var_names:
-        string += temp +', '
-    string += temp + ';'
-    quadruples.insert(index + 1, string)
-    #quadruples.insert(index , temp_var_names)
-    return index + 2 
-   
-
-def flush_to_file(program_name):
+    if p is None:
+        message = 'Syntax error at end of input'
+    else:
+        message = (f'Syntax error at {p.value!r} '
+                   f'(line {p.lineno}, column {find_column(p)})')
+    # stop at the first syntax error, the session adds it to its errors
+    raise CompileError([message])
+
+# column of a token, counted from 1 (the tokens of scanner.py know it)
+def find_column(token):
+    column = getattr(token, 'column', None)
+    if column is None:
+        column = token.lexpos - token.lexer.lexdata.rfind('\n', 0, token.lexpos)
+    return column
+
+# --- Building the lexer and the parser
+
+# Both are built on first use, so importing this module costs almost
+# nothing.  The LALR tables are generated once per grammar: they are pickled
+# in TABLE_DIR under a hash of the grammar (the tokens, the precedences and
+# the rules) and every later process loads that file instead of running
+# yacc, which introspects the module and regenerates the tables.
+
+TABLE_DIR = (os.environ.get('COMPILER_TABLE_DIR') or
+             os.path.join(os.path.dirname(os.path.abspath(__file__)), '__pycache__'))
+
+_lexer = None
+_parser = None
+_build_lock = threading.Lock()
+
+def grammar_hash():
+    import hashlib
+    from ply.yacc import __tabversion__
+    digest = hashlib.sha256(repr((__tabversion__, tokens, precedence, 'program')).encode())
+    module = globals()
+    for name in sorted(module):
+        if name.startswith('p_') and name != 'p_error':
+            digest.update(('%s:%s\n' % (name, module[name].__doc__)).encode())
+    return digest.hexdigest()[:20]
+
+def table_file():
+    return os.path.join(TABLE_DIR, 'parsetab-%s.pickle' % grammar_hash())
+
+def get_lexer():
+    global _lexer, reserved
+    if _lexer is None:
+        with _build_lock:
+            if _lexer is None:
+                from ply.lex import lex
+                from scanner import reserved
+                _lexer = lex(module=sys.modules[__name__])
+    return _lexer
+
+def get_parser():
+    global _parser
+    if _parser is None:
+        with _build_lock:
+            if _parser is None:
+                import pickle
+                path = table_file()
+                try:
+                    _parser = load_parser(path)
+                except (OSError, EOFError, KeyError, pickle.UnpicklingError):
+                    _parser = build_parser(path)
+    return _parser
+
+def load_parser(path):
+    import pickle
+    from ply.yacc import LRParser, LRTable, MiniProduction
+    with open(path, 'rb') as fp:
+        tables = pickle.load(fp)
+    lr = LRTable()
+    lr.lr_action = tables['action']
+    lr.lr_goto = tables['goto']
+    lr.lr_productions = [MiniProduction(*p) for p in tables['productions']]
+    lr.bind_callables(globals())
+    return LRParser(lr, p_error)
+
+def build_parser(path):
+    import pickle
+    import tempfile
+    from ply.yacc import yacc
+    parser = yacc(module=sys.modules[__name__], start='program',
+                  debug=False, write_tables=False)
+    tables = {
+        'action': parser.action,
+        'goto': parser.goto,
+        'productions': [(p.str, p.name, p.len, p.func, p.file, p.line)
+                        for p in parser.productions],
+    }
+    # write to a temporary file and rename it, so a process never loads
+    # a half written table
+    try:
+        os.makedirs(TABLE_DIR, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=TABLE_DIR, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as fp:
+            pickle.dump(tables, fp, pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_path, path)
+    except OSError:
+        pass
+    return parser
+
+# --- Compiler sessions
+
+
+class CompileError(Exception):
+    def __init__(self, errors):
+        super().__init__('\n'.join(errors))
+        self.errors = errors
+
+# A CompilerSession owns everything one compilation changes (the
+# quadruples, the variable and temp lists, the errors).  The lexer and the
+# parser are built once; every compile works on cheap copies of them, so
+# sessions can be used one after the other and from several threads at
+# the same time (one session per thread).
+#
+# ast_mode is what the parser keeps of the program: 'tuple' for the nested
+# tuples, 'compact' for the node classes of nodes.py, 'none' for nothing
+# but the program name and the declarations.  With scanner=True the tokens
+# come from the hand-written scanner of scanner.py instead of the PLY lexer.
+#
+# compile() and compile_file() take an optional output path: the C text is
+# then written there while the program is parsed (see stream.py) instead of
+# being kept as quadruples.  With a profile (see instrument.py) the session
+# records where the time of its compiles goes.  passes are the names of the
+# optimization passes (see optimize.py) run on the quadruples after
+# parsing, they cannot be used with an output path.
+
+# how a switch tests its value, see CompilerSession.dispatch
+LINEAR_CASES = 4
+TABLE_DENSITY = 0.5
+
+class CompilerSession:
+    def __init__(self, ast_mode='tuple', scanner=False, profile=None, passes=()):
+        self.ast_mode = ast_mode
+        self.scanner = scanner
+        self.profile = profile
+        self.passes = tuple(passes)
+        self.reset()
+
+    def reset(self, output=None):
+        # generated code (see ir.py)
+        if output is not None and self.passes:
+            raise ValueError('optimization passes need the quadruples, not a streaming output')
+        # the declared variables
+        self.symbols = SymbolTable()
+        # whether the C text is written while parsing (see stream.py)
+        self.streaming = output is not None
+        if output is None:
+            self.quadruples = Quadruples()
+            # list of temp variables which used in expressions
+            self.temp_var_names = []
+        else:
+            from stream import StreamingQuadruples
+            self.quadruples = StreamingQuadruples(output, self.symbols.reals)
+            self.temp_var_names = TempNames(self.symbols.reals)
+        # int and real temps made
+        self.int_temps = 0
+        self.real_temps = 0
+        self.program_name = None
+        self.declar_list = []
+        # (line, column) of the identifiers of the declarations
+        self.declared_at = []
+        self.errors = []
+
+    # backpatch(l, i): every jump in the patch list l goes to instruction i
+    def backpatch(self, l, i):
+        self.quadruples.backpatch(l, i)
+
+    merge = staticmethod(merge)
+
+    def nextinstr(self):
+        return self.quadruples.nextinstr()
+
+    # nextinstr() of a position jumps may go to
+    def mark(self):
+        return self.quadruples.mark()
+
+    # the C name of a variable used at `line`, the string of the symbol
+    # table; an undeclared variable is an error, reported once
+    def variable(self, name, line):
+        id = self.symbols.lookup(name)
+        if id is None:
+            self.errors.append(f'Undeclared variable {name!r} (line {line})')
+            id = self.symbols.declare(name, 'int')
+        return self.symbols.c_names[id]
+
+    # a new temp holding an int, or a real: temp_int_1, temp_int_2, ... and
+    # temp_real_1, ..., the real ones in symbols.reals
+    def new_temp(self, real=False):
+        if real:
+            self.real_temps += 1
+            temp_var_name = 'temp_real_' + str(self.real_temps)
+            self.symbols.reals.add(temp_var_name)
+        else:
+            self.int_temps += 1
+            temp_var_name = 'temp_int_' + str(self.int_temps)
+        self.temp_var_names.append(temp_var_name)
+        return temp_var_name
+
+    # returns the operand which holds the value of an expression:
+    # arithmetic expressions carry the temp their result was stored in
+    # as the last item of the tuple, and boolean expressions are turned
+    # into 1 or 0 in a new temp
+    def operand(self, expr):
+        if type(expr) == tuple:
+            return expr[3]
+        elif type(expr) == str:
+            return expr
+        elif isinstance(expr, E):
+            temp = self.new_temp()
+            self.backpatch(expr.truelist, self.mark())
+            self.quadruples.append(':=', '1', result=temp)
+            # jump over the assignment of false
+            skip = makelist(self.quadruples.append('goto'))
+            self.backpatch(expr.falselist, self.mark())
+            self.quadruples.append(':=', '0', result=temp)
+            self.backpatch(skip, self.mark())
+            return temp
+        else:
+            # BinOp or Neg of the compact ast
+            return expr.place
+
+    # generates the tests of a switch on `value` (see p_statement_switch):
+    # cases are (constant, first instruction) pairs, default the first
+    # instruction of the default case or None.  Up to LINEAR_CASES cases
+    # are tested one after the other; more cases filling at least
+    # TABLE_DENSITY of the range between the smallest and the largest
+    # constant make a jump table (a C switch), sparser ones a binary
+    # search.  Returns the jumps to the default when there is none.
+    def dispatch(self, value, cases, default):
+        append = self.quadruples.append
+        cases = sorted(cases)
+        defaults = []
+
+        def to_default():
+            if default is None:
+                defaults.append(append('goto'))
+            else:
+                append('goto', target=default)
+
+        def search(cases):
+            if len(cases) <= LINEAR_CASES:
+                for constant, start in cases:
+                    append('=', value, str(constant), target=start)
+                to_default()
+                return
+            middle = len(cases) // 2
+            high = makelist(append('>=', value, str(cases[middle][0])))
+            search(cases[:middle])
+            self.backpatch(high, self.mark())
+            search(cases[middle:])
+
+        span = cases[-1][0] - cases[0][0] + 1
+        if len(cases) > LINEAR_CASES and len(cases) >= TABLE_DENSITY * span:
+            append('switch', value)
+            for constant, start in cases:
+                append('case', str(constant), target=start)
+            if default is None:
+                defaults.append(append('default'))
+            else:
+                append('default', target=default)
+        else:
+            search(cases)
+        nextlist = None
+        for i in defaults:
+            nextlist = self.merge(nextlist, makelist(i))
+        return nextlist
+
+    def compile(self, text, output=None):
+        self.reset(output)
+        if self.scanner:
+            from scanner import Scanner
+            session_lexer = Scanner()
+        else:
+            session_lexer = get_lexer().clone()
+        return self.parse(text, session_lexer)
+
+    # compiles a source file without reading it into a string: the file
+    # is memory-mapped and scanner.py feeds its tokens to the parser one
+    # at a time
+    def compile_file(self, path, output=None):
+        from scanner import Scanner
+        self.reset(output)
+        with open(path, 'rb') as fp:
+            if os.fstat(fp.fileno()).st_size == 0:
+                return self.parse(b'', Scanner())
+            with mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                return self.parse(data, Scanner())
+
+    def parse(self, text, session_lexer):
+        session_lexer.session = self
+        session_lexer.input(text)
+        if self.profile is None:
+            session_parser = copy.copy(get_parser())
+            tokenfunc = session_lexer.token
+        else:
+            session_parser, tokenfunc = self.profile.instrument(self, get_parser(), session_lexer)
+        session_parser.session = self
+        streaming = self.streaming
+        try:
+            ast = session_parser.parse(lexer=session_lexer, tokenfunc=tokenfunc)
+        except CompileError as e:
+            self.errors += e.errors
+        except BaseException:
+            if streaming:
+                self.quadruples.abort()
+            raise
+        if self.profile is not None:
+            self.profile.parsed(self)
+        if self.errors:
+            if streaming:
+                self.quadruples.abort()
+            raise CompileError(self.errors)
+        if streaming:
+            self.quadruples.finish(
+                declarations(self.symbols, self.temp_var_names, self.profile))
+        elif self.passes:
+            self.optimize()
+        return CompileResult(self, ast)
+
+    def optimize(self):
+        from optimize import Names, optimize, temp_names
+        if self.profile is not None:
+            start = time.perf_counter()
+        names = Names(self.temp_var_names, self.symbols.reals)
+        self.quadruples = optimize(self.quadruples, self.passes, names)
+        # temps the passes made useless are not declared, the ones they
+        # made up are
+        self.temp_var_names = temp_names(self.quadruples, names)
+        if self.profile is not None:
+            self.profile.phase('optimize', time.perf_counter() - start)
+
+
+# the temps of a streaming compile: only their numbers are kept, the names
+# are generated when the declarations are written
+class TempNames:
+    def __init__(self, reals):
+        self.reals = reals
+        self.ints = 0
+        self.floats = 0
+
+    def append(self, name):
+        if name in self.reals:
+            self.floats += 1
+        else:
+            self.ints += 1
+
+    def __len__(self):
+        return self.ints + self.floats
+
+    def __iter__(self):
+        yield from ('temp_int_' + str(i) for i in range(1, self.ints + 1))
+        yield from ('temp_real_' + str(i) for i in range(1, self.floats + 1))
+
+
+class CompileResult:
+    def __init__(self, session, ast):
+        self.program_name = session.program_name
+        self.declar_list = session.declar_list
+        self.quadruples = session.quadruples
+        self.streaming = session.streaming
+        self.symbols = session.symbols
+        self.temp_var_names = session.temp_var_names
+        self.ast = ast
+        self.profile = session.profile
+
+    # the whole C program: declarations, then the quadruples inside main
+    def c_lines(self):
+        if self.streaming:
+            # already written, read it back
+            with open(self.quadruples.path) as fp:
+                return fp.read().splitlines()
+        lines = ['#include <stdio.h>']
+        lines += declarations(self.symbols, self.temp_var_names, self.profile)
+        lines.append('int main() {')
+        if self.profile is None:
+            lines += self.quadruples.emit(self.symbols.reals)
+        else:
+            start = time.perf_counter()
+            lines += self.quadruples.emit(self.symbols.reals)
+            self.profile.phase('emit', time.perf_counter() - start)
+        lines.append('}')
+        return lines
+
+    def c_text(self):
+        return '\n'.join(self.c_lines()) + '\n'
+
+    # runs the program in-process (see vm.py) and returns what it prints,
+    # the output of the C program
+    def run(self, limit=None):
+        if self.streaming:
+            raise ValueError('running needs the quadruples, not a streaming output')
+        from vm import load
+        return load(self.quadruples, self.symbols).run(limit)
+
+
+def compile_source(text, ast_mode='tuple', scanner=False, output=None, profile=None,
+                   passes=()):
+    return CompilerSession(ast_mode, scanner, profile, passes).compile(text, output)
+
+def compile_file(path, ast_mode='tuple', output=None, profile=None, passes=()):
+    return CompilerSession(ast_mode, True, profile, passes).compile_file(path, output)
+
+# insertion_of_declaration_list, timed when there is a profile
+def declarations(symbols, temp_var_names, profile=None):
+    if profile is None:
+        return insertion_of_declaration_list(symbols, temp_var_names)
+    start = time.perf_counter()
+    lines = insertion_of_declaration_list(symbols, temp_var_names)
+    profile.phase('declarations', time.perf_counter() - start)
+    return lines
+
+# returns the C declarations of the program variables (see symbols.py)
+# and the temps, the real ones floats
+def insertion_of_declaration_list(symbols, temp_var_names):
+    declarations = symbols.c_declarations()
+    ints = [name for name in temp_var_names if name not in symbols.reals]
+    floats = [name for name in temp_var_names if name in symbols.reals]
+    if ints:
+        declarations.append('int ' + ', '.join(ints) + ';')
+    if floats:
+        declarations.append('float ' + ', '.join(floats) + ';')
+    return declarations
+
+def flush_to_file(program_name, lines):
     file_name = program_name + '.c'
     with open(file_name, 'w') as fp:
-        for item in quadruples:
+        for item in lines:
         # write each item on a new line
             fp.write("%s\n" % item)
     print('Done')
-#data = 'var sam, tiare, pain : int; a,b,c:real'
-# input = '''program iliare
-# var a,b:real;c:real;x:real;y:real
-# begin
-# if x < 5 then
-#     x := 3
-# else
-#     while x > 5 do
-#         x := -x - 1;
-#     s:= 1;
-#     if a < c then
-#         print(f)
-# end'''
-#input = '(!(!(e < f))) && (salam = kh) || (22 <> m)'
-#input = 'while 3 = 5 do if 3 <> 4 then x:= z else x := y % 4'
-input = '''
+
+
+def compile_sample():
+    #data = 'var sam, tiare, pain : int; a,b,c:real'
+    # input = '''program iliare
+    # var a,b:real;c:real;x:real;y:real
+    # begin
+    # if x < 5 then
+    #     x := 3
+    # else
+    #     while x > 5 do
+    #         x := -x - 1;
+    #     s:= 1;
+    #     if a < c then
+    #         print(f)
+    # end'''
+    #input = '(!(!(e < f))) && (salam = kh) || (22 <> m)'
+    #input = 'while 3 = 5 do if 3 <> 4 then x:= z else x := y % 4'
+    input = '''
 program prg
 var a, b: int; c, d, e, f, m, g, s: int
 begin
@@ -692,20 +1082,64 @@ while 5 <> 2 do
  s := !(a > b)
 end
 '''
-# Parse an expression
-ast = parser.parse(input, debug=False)
-print(ast)
-
-print(f'primary_var_names:{set(primary_var_names)}, temps:{temp_var_names}')
-
-if ast[2][0] == 'var':
-    declar_list = ast[2][1]
-else:
-    declar_list = []    
-#flush_to_file(ast[1])
-index = insertion_of_declaration_list(declar_list)
-quadruples.insert(index, 'int main() {')
-quadruples.append('}')
-for i in quadruples:
-    print(i)
-flush_to_file(ast[1])    
\ No newline at end of file
+    # Parse an expression
+    result = compile_source(input)
+    print(result.ast)
+
+    print(f'variables:{result.symbols.names}, temps:{result.temp_var_names}')
+
+    lines = result.c_lines()
+    for i in lines:
+        print(i)
+    flush_to_file(result.program_name, lines)
+
+
+if __name__ == '__main__':
+    import argparse
+    import batch
+    from optimize import DEFAULT_PASSES, PASSES
+
+    arg_parser = argparse.ArgumentParser(
+        description='Compile programs to C. Without sources, compiles the sample program.')
+    arg_parser.add_argument('sources', nargs='*',
+                            help='source files, or directories to search for them')
+    arg_parser.add_argument('-o', '--output-dir',
+                            help='where to write the C files (default: next to the sources)')
+    arg_parser.add_argument('-j', '--jobs', type=int, default=None,
+                            help='number of worker processes (default: one per core)')
+    arg_parser.add_argument('--suffix', default='.txt',
+                            help='suffix of the sources searched in directories')
+    arg_parser.add_argument('--stream', action='store_true',
+                            help='write the C text while parsing instead of keeping the '
+                                 'quadruples in memory')
+    arg_parser.add_argument('--cache-dir',
+                            help='reuse the C files of unchanged sources from this directory')
+    arg_parser.add_argument('--cache-size', type=int, default=256,
+                            help='size of the cache in MiB (default: 256)')
+    arg_parser.add_argument('--profile', metavar='FILE',
+                            help='write the phase times and counters of the compiles '
+                                 'as JSON to this file')
+    arg_parser.add_argument('-O', '--optimize', action='store_true',
+                            help='run the default optimization passes (%s)'
+                                 % ', '.join(DEFAULT_PASSES))
+    arg_parser.add_argument('--passes',
+                            help='comma separated optimization passes to run, in order')
+    args = arg_parser.parse_args()
+    if args.passes:
+        passes = tuple(name for name in args.passes.split(',') if name)
+    elif args.optimize:
+        passes = DEFAULT_PASSES
+    else:
+        passes = ()
+    unknown = [name for name in passes if name not in PASSES]
+    if unknown:
+        arg_parser.error('unknown optimization passes: %s (known: %s)'
+                         % (', '.join(unknown), ', '.join(PASSES)))
+    if passes and args.stream:
+        arg_parser.error('--stream cannot be used with optimization passes')
+    if args.sources:
+        failures = batch.run(args.sources, args.output_dir, args.jobs, args.suffix,
+                             args.stream, args.cache_dir, args.cache_size * 1024 * 1024,
+                             args.profile, passes)
+        sys.exit(1 if failures else 0)
+    compile_sample()
@@ -0,0 +1,268 @@
+# Native builds of the generated code: compiles the C text of programs with
+# the local C compiler at chosen optimization levels and runs the binaries
+# under a timer, so a change of the code generation or of the optimization
+# passes (see optimize.py) can be judged by the speed and size of the code
+# it produces.
+#
+# Binaries are kept in a cache (see cache.py) keyed by the C text, the
+# compiler and its flags: a program whose C text did not change is not
+# built again, whatever made it.  Without a cache directory the binaries
+# are kept in a temporary one for the run.
+#
+# For every program, pass list and level the report gives the
+# instructions, the seconds of the build (0 when cached), the size of the
+# binary and the best of `repeat` runs.  The outputs of all the builds of
+# a program must be the same; a build which fails or a run which times
+# out or fails is reported instead.
+#
+#   python native.py SOURCE... [--levels 0 2] [--passes none fold,lvn ...] [--cache-dir DIR]
+
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import main
+from cache import DEFAULT_SIZE, Cache
+from optimize import DEFAULT_PASSES, PASSES
+
+DEFAULT_LEVELS = ('0', '2')
+
+
+class BuildError(Exception):
+    pass
+
+
+# the C compiler: $CC, or the first of cc, gcc and clang found
+def find_compiler():
+    if os.environ.get('CC'):
+        return shutil.which(os.environ['CC'])
+    for name in ('cc', 'gcc', 'clang'):
+        path = shutil.which(name)
+        if path is not None:
+            return path
+    return None
+
+
+_versions = {}
+
+
+# the first line of `compiler --version`, part of the key of its binaries
+def compiler_version(compiler):
+    if compiler not in _versions:
+        output = subprocess.run([compiler, '--version'], capture_output=True, text=True).stdout
+        _versions[compiler] = output.splitlines()[0] if output else compiler
+    return _versions[compiler]
+
+
+class BinaryCache(Cache):
+    extension = '.bin'
+
+    # the path of the binary of an entry and its metadata, or None on a
+    # miss (the entry may be evicted while it is used, like a C file of
+    # the cache being copied)
+    def binary(self, key):
+        path = self.path(key, self.extension)
+        try:
+            with open(self.path(key, '.json')) as fp:
+                metadata = json.load(fp)
+            os.utime(path)
+        except (OSError, ValueError):
+            return None
+        return path, metadata
+
+
+class Builder:
+    def __init__(self, cache, compiler=None):
+        self.cache = cache
+        self.compiler = compiler or find_compiler()
+        if self.compiler is None:
+            raise BuildError('no C compiler found (set CC)')
+
+    def key(self, c_text, flags):
+        digest = hashlib.sha256()
+        digest.update(compiler_version(self.compiler).encode('utf-8'))
+        digest.update(b'\0')
+        digest.update(json.dumps([self.compiler] + flags).encode('utf-8'))
+        digest.update(b'\0')
+        digest.update(c_text.encode('utf-8'))
+        return digest.hexdigest()
+
+    # returns the path of the binary of c_text built with flags and
+    # {'size': bytes, 'seconds': of the build, 0 when it was cached}
+    def build(self, c_text, flags):
+        key = self.key(c_text, flags)
+        found = self.cache.binary(key)
+        if found is not None:
+            path, metadata = found
+            return path, dict(metadata, seconds=0.0)
+        with tempfile.TemporaryDirectory() as directory:
+            source = os.path.join(directory, 'program.c')
+            binary = os.path.join(directory, 'program')
+            with open(source, 'w') as fp:
+                fp.write(c_text)
+            start = time.perf_counter()
+            built = subprocess.run([self.compiler, '-w'] + flags + ['-o', binary, source],
+                                   capture_output=True, text=True)
+            seconds = time.perf_counter() - start
+            if built.returncode != 0:
+                errors = built.stderr.strip().splitlines()
+                raise BuildError(errors[0] if errors else 'exit status %d' % built.returncode)
+            metadata = {'flags': flags, 'size': os.path.getsize(binary)}
+            self.cache.put(key, binary, metadata)
+        path, metadata = self.cache.binary(key)
+        return path, dict(metadata, seconds=seconds)
+
+
+# runs a binary `repeat` times and returns its output and the seconds of
+# the fastest run
+def run_binary(path, repeat=3, timeout=60):
+    best = float('inf')
+    output = None
+    for i in range(repeat):
+        start = time.perf_counter()
+        done = subprocess.run([path], capture_output=True, timeout=timeout)
+        best = min(best, time.perf_counter() - start)
+        if done.returncode != 0:
+            raise subprocess.CalledProcessError(done.returncode, path)
+        output = done.stdout
+    return output, best
+
+
+# Builds and runs every source (a path, or a (name, text) pair) compiled
+# with every pass list at every level.  Returns one dict per build, with
+# 'status' 'ok', 'mismatch' (its output differs from the first build of
+# the program), 'compile failed' (one row for all the levels), 'build
+# failed', 'timeout' or 'failed'.
+def measure(sources, pass_lists, levels, builder, repeat=3, timeout=60, report=None):
+    main.get_parser()
+    results = []
+    for source in sources:
+        if isinstance(source, str):
+            name = source
+        else:
+            name, text = source
+        expected = None
+        for passes in pass_lists:
+            try:
+                if isinstance(source, str):
+                    result = main.compile_file(source, 'none', passes=passes)
+                else:
+                    result = main.compile_source(text, 'none', scanner=True, passes=passes)
+            except main.CompileError as e:
+                row = {'program': name, 'passes': ','.join(passes) or 'none', 'level': '-',
+                       'instructions': None, 'build': None, 'size': None, 'run': None,
+                       'status': 'compile failed', 'error': e.errors[0]}
+                results.append(row)
+                if report is not None:
+                    report(row)
+                continue
+            c_text = result.c_text()
+            for level in levels:
+                row = {'program': name, 'passes': ','.join(passes) or 'none',
+                       'level': '-O' + level, 'instructions': len(result.quadruples),
+                       'build': None, 'size': None, 'run': None}
+                try:
+                    path, metadata = builder.build(c_text, ['-O' + level])
+                    row['build'] = metadata['seconds']
+                    row['size'] = metadata['size']
+                    output, row['run'] = run_binary(path, repeat, timeout)
+                except BuildError as e:
+                    row['status'] = 'build failed'
+                    row['error'] = str(e)
+                except subprocess.TimeoutExpired:
+                    row['status'] = 'timeout'
+                except subprocess.CalledProcessError as e:
+                    row['status'] = 'failed'
+                    row['error'] = 'exit status %d' % e.returncode
+                else:
+                    if expected is None:
+                        expected = output
+                    row['status'] = 'ok' if output == expected else 'mismatch'
+                results.append(row)
+                if report is not None:
+                    report(row)
+    return results
+
+
+def print_row(row):
+    print('%-24s %-36s %5s %12s %s %s %s %s' % (
+        row['program'][-24:], row['passes'][:36], row['level'],
+        '-' if row['instructions'] is None else row['instructions'],
+        '%8s' % '-' if row['build'] is None else '%8.3f' % row['build'],
+        '%9s' % '-' if row['size'] is None else '%9d' % row['size'],
+        '%10s' % '-' if row['run'] is None else '%10.4f' % row['run'],
+        row['status'] + (': ' + row['error'] if 'error' in row else '')))
+
+
+def print_header():
+    print('%-24s %-36s %5s %12s %8s %9s %10s %s' % (
+        'program', 'passes', 'level', 'instructions', 'build', 'size', 'run', 'status'))
+
+
+# the pass lists of the command line: comma separated names, 'none' for
+# no passes and 'default' for the default ones
+def parse_pass_lists(specs):
+    pass_lists = []
+    for spec in specs:
+        if spec == 'none':
+            passes = ()
+        elif spec == 'default':
+            passes = DEFAULT_PASSES
+        else:
+            passes = tuple(name for name in spec.split(',') if name)
+        unknown = [name for name in passes if name not in PASSES]
+        if unknown:
+            raise ValueError('unknown optimization passes: %s (known: %s)'
+                             % (', '.join(unknown), ', '.join(PASSES)))
+        if passes not in pass_lists:
+            pass_lists.append(passes)
+    return pass_lists
+
+
+def run(sources, pass_lists, levels, cache_dir=None, cache_size=DEFAULT_SIZE, compiler=None,
+        repeat=3, timeout=60):
+    with tempfile.TemporaryDirectory() as directory:
+        cache = BinaryCache(cache_dir or directory, cache_size)
+        builder = Builder(cache, compiler)
+        print_header()
+        results = measure(sources, pass_lists, levels, builder, repeat, timeout, print_row)
+        cache.evict()
+    return results
+
+
+if __name__ == '__main__':
+    arg_parser = argparse.ArgumentParser(
+        description='Build the C output of programs and time the binaries.')
+    arg_parser.add_argument('sources', nargs='+', help='source files')
+    arg_parser.add_argument('--levels', nargs='+', default=list(DEFAULT_LEVELS),
+                            help='C optimization levels (default: %s)' % ' '.join(DEFAULT_LEVELS))
+    arg_parser.add_argument('--passes', nargs='+', default=['none', 'default'],
+                            help="pass lists to compare: comma separated passes, 'none' or "
+                                 "'default' (default: none default)")
+    arg_parser.add_argument('--cache-dir', help='keep the binaries in this directory')
+    arg_parser.add_argument('--cache-size', type=int, default=256,
+                            help='size of the cache in MiB (default: 256)')
+    arg_parser.add_argument('--cc', help='the C compiler (default: $CC, cc, gcc or clang)')
+    arg_parser.add_argument('--repeat', type=int, default=3,
+                            help='runs of every binary, the fastest is reported')
+    arg_parser.add_argument('--timeout', type=float, default=60,
+                            help='seconds a run may take')
+    arg_parser.add_argument('-o', '--output', help='write the results as JSON to this file')
+    args = arg_parser.parse_args()
+    try:
+        pass_lists = parse_pass_lists(args.passes)
+        results = run(args.sources, pass_lists, args.levels, args.cache_dir,
+                      args.cache_size * 1024 * 1024, args.cc, args.repeat, args.timeout)
+    except (ValueError, BuildError) as e:
+        arg_parser.error(str(e))
+    if args.output:
+        with open(args.output, 'w') as fp:
+            json.dump(results, fp, indent=2)
+            fp.write('\n')
+    sys.exit(0 if all(row['status'] == 'ok' for row in results) else 1)
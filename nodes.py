@@ -0,0 +1,94 @@
+# Compact syntax tree, built instead of the nested tuples when the
+# ast_mode is 'compact'.  Every node has fixed __slots__, statements keep
+# their nextlist (a patch list, see ir.py) and arithmetic nodes the operand
+# holding their value.
+
+
+class Node:
+    __slots__ = ()
+
+    def __repr__(self):
+        fields = ', '.join('%s=%r' % (name, getattr(self, name)) for name in self.__slots__)
+        return '%s(%s)' % (type(self).__name__, fields)
+
+
+class Program(Node):
+    __slots__ = ('name', 'declarations', 'body')
+
+    def __init__(self, name, declarations, body):
+        self.name = name
+        self.declarations = declarations
+        self.body = body
+
+
+class Block(Node):
+    __slots__ = ('nextlist', 'statements')
+
+    def __init__(self, nextlist, statements):
+        self.nextlist = nextlist
+        self.statements = statements
+
+
+class Assign(Node):
+    __slots__ = ('nextlist', 'target', 'value')
+
+    def __init__(self, nextlist, target, value):
+        self.nextlist = nextlist
+        self.target = target
+        self.value = value
+
+
+class If(Node):
+    __slots__ = ('nextlist', 'condition', 'then', 'otherwise')
+
+    def __init__(self, nextlist, condition, then, otherwise=None):
+        self.nextlist = nextlist
+        self.condition = condition
+        self.then = then
+        self.otherwise = otherwise
+
+
+class While(Node):
+    __slots__ = ('nextlist', 'condition', 'body')
+
+    def __init__(self, nextlist, condition, body):
+        self.nextlist = nextlist
+        self.condition = condition
+        self.body = body
+
+
+class Print(Node):
+    __slots__ = ('nextlist', 'value')
+
+    def __init__(self, nextlist, value):
+        self.nextlist = nextlist
+        self.value = value
+
+
+class BinOp(Node):
+    __slots__ = ('op', 'left', 'right', 'place')
+
+    def __init__(self, op, left, right, place):
+        self.op = op
+        self.left = left
+        self.right = right
+        self.place = place
+
+
+class Neg(Node):
+    __slots__ = ('operand', 'place')
+
+    def __init__(self, operand, place):
+        self.operand = operand
+        self.place = place
+
+
+class Switch(Node):
+    __slots__ = ('nextlist', 'value', 'cases', 'otherwise')
+
+    def __init__(self, nextlist, value, cases, otherwise=None):
+        self.nextlist = nextlist
+        self.value = value
+        # (constant, statement) pairs
+        self.cases = cases
+        self.otherwise = otherwise
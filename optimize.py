@@ -0,0 +1,802 @@
+# Optimization passes over the quadruples of ir.py.
+#
+# A pass takes a Quadruples and the Names of the program and returns a
+# Quadruples (the same object or a new one).
+# They run after parsing, when all the jumps are backpatched, so they do
+# not apply to streaming compiles (stream.py writes the instructions as
+# they are generated).
+#
+#   fold      constant folding and static branch elimination
+#   jumps     jump threading and unreachable-code removal
+#   lvn       local value numbering: common subexpressions, copy
+#             propagation and dead temps
+#   licm      loop-invariant code motion
+#   strength  strength reduction: products of induction variables and
+#             powers of two
+#   temps     reuse of temps: as few temps as values live at the same time
+#
+# The temps of the parser are assigned once (an arithmetic temp) or twice
+# on two paths (the 1 / 0 of a boolean turned into a value, see
+# CompilerSession.operand); program variables may be assigned anywhere.
+
+import itertools
+from array import array
+
+from cfg import CFG, block_leaders, blocks, liveness
+from ir import (ARITHMETIC_OPS, GOTO_OPS, JUMP_OPS, NO_TARGET, RELATIONAL_OPS, Quadruples,
+                is_constant, is_real)
+
+INT_MIN = -2 ** 31
+INT_MAX = 2 ** 31 - 1
+
+# the test which holds when a relational test does not
+NEGATED_RELOPS = {'<': '>=', '<=': '>', '>': '<=', '>=': '<', '=': '<>', '<>': '='}
+
+
+# What the passes know of the names besides the instructions: the temps,
+# in the order they were made, and the real variables and temps.  A temp
+# is a name of that list, not a name spelled like one, a program variable
+# may be called anything; a pass making temps makes them here, ints.
+class Names:
+    def __init__(self, temps=(), reals=()):
+        self.temps = list(temps)
+        self.temp_set = set(self.temps)
+        self.reals = set(reals)
+
+    def is_temp(self, operand):
+        return operand in self.temp_set
+
+    # whether an operand is a real variable or constant
+    def is_real(self, operand):
+        return operand is not None and is_real(operand, self.reals)
+
+    # a new temp, numbered after the ones of the list like the session
+    # numbers them
+    def new_temp(self):
+        number = len(self.temps) + 1
+        while 'temp_int_' + str(number) in self.temp_set:
+            number += 1
+        name = 'temp_int_' + str(number)
+        self.temps.append(name)
+        self.temp_set.add(name)
+        return name
+
+
+def is_int_constant(operand):
+    return operand is not None and is_constant(operand) and '.' not in operand
+
+
+# value of an int operation the way C computes it (division truncates
+# toward zero), or None when it is not folded: division by zero and
+# results outside of int are left to run time
+def fold_arithmetic(op, a, b):
+    if op == '+':
+        value = a + b
+    elif op == '-':
+        value = a - b
+    elif op == '*':
+        value = a * b
+    elif op == '<<':
+        value = a << b if 0 <= b < 32 else None
+    elif op == '>>':
+        value = a >> b if 0 <= b < 32 else None
+    elif op == '&':
+        value = a & b
+    elif b == 0:
+        return None
+    else:
+        quotient = abs(a) // abs(b)
+        if (a < 0) != (b < 0):
+            quotient = -quotient
+        value = quotient if op == '/' else a - b * quotient
+    if value is None or value < INT_MIN or value > INT_MAX:
+        return None
+    return value
+
+
+def compare(op, a, b):
+    if op == '<':
+        return a < b
+    elif op == '<=':
+        return a <= b
+    elif op == '>':
+        return a > b
+    elif op == '>=':
+        return a >= b
+    elif op == '=':
+        return a == b
+    return a != b
+
+
+def number(operand):
+    return float(operand) if '.' in operand else int(operand)
+
+
+# Folds the arithmetic on int constants and propagates the constant value
+# of a temp assigned once into its uses (and drops its assignment).  A
+# relational test of two constants becomes a goto when it holds and is
+# dropped when it does not, so the constant truelists and falselists of
+# && || ! collapse into unconditional jumps; a goto to the next
+# instruction is dropped too.
+def fold_constants(quadruples, names):
+    ops = quadruples.op
+    arg1 = quadruples.arg1
+    arg2 = quadruples.arg2
+    result = quadruples.result
+    target = quadruples.target
+    size = len(quadruples)
+
+    definitions = {}
+    for i in range(size):
+        if names.is_temp(result[i]):
+            definitions[result[i]] = definitions.get(result[i], 0) + 1
+
+    # constant value of the temps assigned once, by instructions in order:
+    # such a temp is assigned before the code of the expression using it
+    constants = {}
+    keep = bytearray(b'\1') * size
+    for i in range(size):
+        op = ops[i]
+        a = constants.get(arg1[i], arg1[i])
+        b = constants.get(arg2[i], arg2[i])
+        arg1[i] = a
+        arg2[i] = b
+        if op in ARITHMETIC_OPS:
+            if is_int_constant(a) and is_int_constant(b):
+                value = fold_arithmetic(op, int(a), int(b))
+                if value is not None:
+                    ops[i] = ':='
+                    arg1[i] = a = str(value)
+                    arg2[i] = None
+                    op = ':='
+        elif op == 'neg' and is_int_constant(a):
+            value = -int(a)
+            if INT_MIN <= value <= INT_MAX:
+                ops[i] = op = ':='
+                arg1[i] = a = str(value)
+        elif op in RELATIONAL_OPS and is_constant(a) and is_constant(b):
+            if compare(op, number(a), number(b)):
+                ops[i] = 'goto'
+                arg1[i] = arg2[i] = None
+            else:
+                keep[i] = 0
+        if op == ':=' and is_constant(a) and definitions.get(result[i]) == 1:
+            constants[result[i]] = a
+            keep[i] = 0
+
+    drop_fall_throughs(quadruples, keep)
+    return compact(quadruples, keep)
+
+
+# Retargets every jump to the end of its chain of gotos, turns
+#   if a < b goto L1; goto L2; L1: ...
+# into `if a >= b goto L2; L1: ...`, removes the instructions no path
+# reaches and the gotos to the instruction which follows them; until the
+# code does not change any more.  The labels left are renumbered by
+# compact(), and only the jumped to ones are emitted.
+def thread_jumps(quadruples, names):
+    while True:
+        size = len(quadruples)
+        ops = quadruples.op
+        target = quadruples.target
+
+        # the end of the chain of gotos starting at every instruction (a
+        # cycle of gotos ends where it was entered)
+        final = array('l', range(size + 1))
+        for i in range(size):
+            if ops[i] == 'goto':
+                chain = []
+                t = i
+                while t < size and ops[t] == 'goto' and final[t] == t and t not in chain:
+                    chain.append(t)
+                    t = target[t]
+                t = final[t]
+                for j in chain:
+                    final[j] = t
+        for i in range(size):
+            if ops[i] in JUMP_OPS:
+                target[i] = final[target[i]]
+
+        keep = bytearray(b'\1') * size
+        targeted = bytearray(size + 1)
+        for i in range(size):
+            if ops[i] in JUMP_OPS:
+                targeted[target[i]] = 1
+        for i in range(size - 2):
+            if (ops[i] in RELATIONAL_OPS and target[i] == i + 2 and ops[i + 1] == 'goto'
+                    and not targeted[i + 1] and keep[i]):
+                ops[i] = NEGATED_RELOPS[ops[i]]
+                target[i] = target[i + 1]
+                keep[i + 1] = 0
+
+        # reachable instructions, from the first one
+        reached = bytearray(size + 1)
+        stack = [0]
+        while stack:
+            i = stack.pop()
+            while i < size and not reached[i]:
+                reached[i] = 1
+                op = ops[i]
+                if not keep[i]:
+                    # the goto dropped after an inverted test
+                    pass
+                elif op in GOTO_OPS:
+                    stack.append(target[i])
+                    break
+                elif op in JUMP_OPS:
+                    stack.append(target[i])
+                i += 1
+        for i in range(size):
+            if not reached[i]:
+                keep[i] = 0
+
+        drop_fall_throughs(quadruples, keep)
+        if all(keep):
+            return quadruples
+        quadruples = compact(quadruples, keep)
+
+
+# Value numbering inside every basic block: an operation computed again on
+# the same values becomes a copy of the name already holding the result,
+# and every operand is replaced by the name holding its value (a constant
+# if it is one, a program variable rather than a temp).  A value is an int
+# or a real, like the names holding it: the result of an operation is
+# the value of its type, and a copy between an int and a real converts
+# (a real is truncated) so it is numbered like an operation.  So is a real
+# constant stored into a real: the constant is a double, the real a
+# float, and the uses of the real must read the rounded value.  Then
+#   temp = a op b; v := temp
+# where the copy is the only use of the temp and v has the type of the
+# temp becomes `v = a op b`, and the temps nothing uses any more are
+# dropped.
+def number_values(quadruples, names):
+    ops = quadruples.op
+    arg1 = quadruples.arg1
+    arg2 = quadruples.arg2
+    result = quadruples.result
+    size = len(quadruples)
+    leaders = block_leaders(quadruples)
+
+    for start, end in blocks(leaders, size):
+        value = {}        # name or constant -> value number
+        holders = {}      # value number -> names holding it, oldest first
+        constant = {}     # value number -> the constant it is
+        expressions = {}  # (op, value number, value number) -> value number
+        numbers = itertools.count()
+
+        def number(operand):
+            v = value.get(operand)
+            if v is None:
+                v = value[operand] = next(numbers)
+                if is_constant(operand):
+                    constant[v] = operand
+                    holders[v] = []
+                else:
+                    holders[v] = [operand]
+            return v
+
+        def holder(v):
+            if v in constant:
+                return constant[v]
+            holding = holders[v]
+            for name in holding:
+                if not names.is_temp(name):
+                    return name
+            return holding[0]
+
+        def assign(name, v):
+            old = value.get(name)
+            if old is not None:
+                holders[old].remove(name)
+            value[name] = v
+            holders.setdefault(v, []).append(name)
+
+        for i in range(start, end):
+            op = ops[i]
+            a = arg1[i]
+            b = arg2[i]
+            va = vb = None
+            if a is not None:
+                va = number(a)
+                arg1[i] = holder(va)
+            if b is not None:
+                vb = number(b)
+                arg2[i] = holder(vb)
+            real = names.is_real(result[i])
+            if op == ':=' and names.is_real(a) == real and not (real and is_constant(a)):
+                assign(result[i], va)
+            elif op in ARITHMETIC_OPS or op in ('neg', ':='):
+                if op in ('+', '*', '&') and va > vb:
+                    key = (op, vb, va, real)
+                else:
+                    key = (op, va, vb, real)
+                v = expressions.get(key)
+                if v is not None and (v in constant or holders[v]):
+                    ops[i] = ':='
+                    arg1[i] = holder(v)
+                    arg2[i] = None
+                else:
+                    v = expressions[key] = next(numbers)
+                assign(result[i], v)
+
+    uses = {}
+    for operands in (arg1, arg2):
+        for name in operands:
+            if names.is_temp(name):
+                uses[name] = uses.get(name, 0) + 1
+
+    keep = bytearray(b'\1') * size
+    for i in range(size - 1):
+        t = result[i]
+        if (names.is_temp(t) and uses.get(t) == 1 and ops[i + 1] == ':=' and arg1[i + 1] == t
+                and names.is_real(result[i + 1]) == names.is_real(t) and not leaders[i + 1]
+                and (ops[i] in ARITHMETIC_OPS or ops[i] in (':=', 'neg'))):
+            result[i] = result[i + 1]
+            uses[t] = 0
+            keep[i + 1] = 0
+
+    # temps without uses, and then the ones only they used
+    definitions = {}
+    for i in range(size):
+        if keep[i] and names.is_temp(result[i]):
+            definitions.setdefault(result[i], []).append(i)
+    dead = [t for t in definitions if not uses.get(t)]
+    while dead:
+        t = dead.pop()
+        for i in definitions.pop(t, ()):
+            keep[i] = 0
+            for name in (arg1[i], arg2[i]):
+                if names.is_temp(name):
+                    uses[name] -= 1
+                    if uses[name] == 0:
+                        dead.append(name)
+    return compact(quadruples, keep)
+
+
+# Loops are found from their back edges: a jump from i back to h makes
+# h..i a loop when nothing outside of it jumps inside but to h (the while
+# statements are laid out that way).  An instruction of the loop computing
+# a temp from constants, from names the loop does not assign and from
+# temps already hoisted is moved to a preheader before h, where the jumps
+# from outside the loop now go.  Only temps are hoisted, assigned once and
+# used nowhere but in the loop, and no division which could trap: the
+# instruction then does the same whether or not the loop body would have
+# reached it.  Inner loops come first, an outer loop can hoist again what
+# is in the preheader of an inner one.
+def hoist_invariants(quadruples, names):
+    ops = quadruples.op
+    arg1 = quadruples.arg1
+    arg2 = quadruples.arg2
+    result = quadruples.result
+    size = len(quadruples)
+    ends = loops(quadruples)
+    if not ends:
+        return quadruples
+
+    definitions = {}
+    uses = {}
+    for i in range(size):
+        if names.is_temp(result[i]):
+            definitions[result[i]] = definitions.get(result[i], 0) + 1
+        for a in (arg1[i], arg2[i]):
+            if names.is_temp(a):
+                uses.setdefault(a, []).append(i)
+
+    # preheaders[h]: the instructions moved before h; where[i]: the header
+    # before which instruction i was moved
+    preheaders = {}
+    where = {}
+
+    def location(i):
+        return where[i] - 0.5 if i in where else i
+
+    for header, end in sorted(ends.items(), key=lambda loop: loop[1] - loop[0]):
+        assigned = set(result[header:end + 1])
+        invariant = set()
+        hoisted = []
+        for position in range(header, end + 1):
+            candidates = preheaders.pop(position, []) if position > header else []
+            if position not in where:
+                candidates.append(position)
+            left = []
+            for i in candidates:
+                op = ops[i]
+                t = result[i]
+                if (not (op in ARITHMETIC_OPS or op in ('neg', ':='))
+                        or not names.is_temp(t) or definitions[t] != 1
+                        or (op in ('/', '%') and
+                            not (is_int_constant(arg2[i]) and int(arg2[i]) != 0))
+                        or not all(header <= location(u) <= end for u in uses.get(t, ()))
+                        or not all(a is None or is_constant(a) or a in invariant
+                                   or a not in assigned for a in (arg1[i], arg2[i]))):
+                    left.append(i)
+                    continue
+                hoisted.append(i)
+                invariant.add(t)
+            if position > header and left:
+                preheaders[position] = [i for i in left if i != position]
+                if not preheaders[position]:
+                    del preheaders[position]
+        for i in hoisted:
+            where[i] = header
+        if hoisted:
+            preheaders[header] = preheaders.get(header, []) + hoisted
+    if not where:
+        return quadruples
+
+    # lay out the preheaders, then jumps to a loop header from outside of
+    # the loop go to its preheader, and jumps to a moved instruction to
+    # what follows it in the loop
+    order = []
+    starts = array('l', [0]) * (size + 1)
+    at = array('l', [0]) * (size + 1)
+    for i in range(size + 1):
+        starts[i] = len(order)
+        order.extend(preheaders.get(i, ()))
+        at[i] = len(order)
+        if i < size and i not in where:
+            order.append(i)
+    following = array('l', [0]) * (size + 1)
+    following[size] = size
+    for i in range(size - 1, -1, -1):
+        following[i] = following[i + 1] if i in where else i
+
+    moved = Quadruples()
+    for i in order:
+        t = quadruples.target[i]
+        if t != NO_TARGET:
+            if t in ends and t in preheaders and not (t <= i <= ends[t]):
+                t = starts[t]
+            elif following[t] != t:
+                t = starts[following[t]]
+            else:
+                t = at[t]
+        moved.append(ops[i], arg1[i], arg2[i], result[i], t)
+    return moved
+
+
+# {header: last instruction} of the single-entry loops.  Once the jumps
+# are threaded, the back edge of an outer loop can be the one of an inner
+# loop ending it: a loop is extended to the jumps back into it from below.
+# The jumps are indexed by target once, the first and the last jump to
+# every instruction, and the ones into a loop are those to the
+# instructions it spans, scanned as it grows: the time is the total length
+# of the loops, not their number times the number of jumps.
+def loops(quadruples):
+    ops = quadruples.op
+    target = quadruples.target
+    size = len(quadruples)
+    first = array('l', [size]) * size
+    last = array('l', [-1]) * size
+    ends = {}
+    for i in range(size):
+        if ops[i] in JUMP_OPS:
+            t = target[i]
+            if 0 <= t < size:
+                first[t] = min(first[t], i)
+                last[t] = max(last[t], i)
+            if t <= i:
+                ends[t] = max(ends.get(t, i), i)
+    for header, end in list(ends.items()):
+        # the first and the last jump to header+1..scanned
+        lowest = size
+        highest = -1
+        scanned = header
+        while True:
+            while scanned < end:
+                scanned += 1
+                lowest = min(lowest, first[scanned])
+                highest = max(highest, last[scanned])
+            if lowest < header:
+                del ends[header]
+                break
+            if highest <= end:
+                ends[header] = end
+                break
+            end = highest
+    return ends
+
+
+# Strength reduction.  In a loop, an induction variable is a name the
+# loop only changes by adding or subtracting constants; its product by a
+# constant is kept in a new temp, computed in a preheader and moved on
+# after every step of the variable, and the multiplication becomes a copy
+# of it.  Then multiplications, divisions and remainders by powers of two
+# become shifts and masks.  A division rounds toward zero, so a negative
+# dividend is first biased by 2^k - 1 (a mask of its sign, x >> 31), and
+# the remainder is the one of that division:
+#
+#   x * 2^k   r = x << k
+#   x / 2^k   s = x >> 31; b = s & 2^k-1; t = x + b; r = t >> k
+#   x % 2^k   s = x >> 31; b = s & 2^k-1; t = x + b; u = t & 2^k-1; r = u - b
+#
+# Only ints are reduced: a real induction variable or a real operand is
+# left as it is, floats have no shifts and the temps of the products are
+# ints.
+#
+# The temps of the induction variables are assigned in several places,
+# the pass runs after the ones counting on temps being assigned once.
+def reduce_strength(quadruples, names):
+    return reduce_powers(reduce_inductions(quadruples, names), names)
+
+
+def reduce_inductions(quadruples, names):
+    ops = quadruples.op
+    arg1 = quadruples.arg1
+    arg2 = quadruples.arg2
+    result = quadruples.result
+    ends = loops(quadruples)
+    preheaders = {}   # header -> instructions before it
+    steps = {}        # i -> instructions after it
+    replaced = {}     # i -> the instruction instead of it
+    for header, end in sorted(ends.items(), key=lambda loop: loop[1] - loop[0]):
+        # name -> [(i, step)], or None when the loop changes it otherwise
+        inductions = {}
+        for i in range(header, end + 1):
+            name = result[i]
+            if name is None or inductions.get(name, 0) is None:
+                continue
+            step = induction_step(ops[i], arg1[i], arg2[i], name)
+            if step is None:
+                inductions[name] = None
+            else:
+                inductions.setdefault(name, []).append((i, step))
+        products = {}
+        for i in range(header, end + 1):
+            if ops[i] != '*' or i in replaced:
+                continue
+            a = arg1[i]
+            b = arg2[i]
+            if is_int_constant(a):
+                a, b = b, a
+            if not is_int_constant(b) or not inductions.get(a) or names.is_real(a):
+                continue
+            factor = int(b)
+            if any(fold_arithmetic('*', step, factor) is None for k, step in inductions[a]):
+                continue
+            product = products.get((a, factor))
+            if product is None:
+                product = products[(a, factor)] = names.new_temp()
+                preheaders.setdefault(header, []).append(('*', a, str(factor), product))
+                for k, step in inductions[a]:
+                    steps.setdefault(k, []).append(('+', product, str(step * factor), product))
+            replaced[i] = (':=', product, None, result[i])
+    if not replaced:
+        return quadruples
+
+    # the jumps to a loop header from outside of the loop go to its
+    # preheader, the other ones to the instruction they went to
+    size = len(quadruples)
+    starts = array('l', [0]) * (size + 1)
+    at = array('l', [0]) * (size + 1)
+    count = 0
+    for i in range(size + 1):
+        starts[i] = count
+        count += len(preheaders.get(i, ()))
+        at[i] = count
+        count += 1 + len(steps.get(i, ()))
+    reduced = Quadruples()
+    for i in range(size):
+        for op, a, b, r in preheaders.get(i, ()):
+            reduced.append(op, a, b, r)
+        op, a, b, r = replaced.get(i) or (ops[i], arg1[i], arg2[i], result[i])
+        t = quadruples.target[i]
+        if t != NO_TARGET:
+            if t in preheaders and not (t <= i <= ends[t]):
+                t = starts[t]
+            else:
+                t = at[t]
+        reduced.append(op, a, b, r, t)
+        for op, a, b, r in steps.get(i, ()):
+            reduced.append(op, a, b, r)
+    return reduced
+
+
+# the constant an instruction adds to `name`, or None
+def induction_step(op, a, b, name):
+    if op == '+' and a == name and is_int_constant(b):
+        return int(b)
+    if op == '+' and b == name and is_int_constant(a):
+        return int(a)
+    if op == '-' and a == name and is_int_constant(b):
+        return -int(b)
+    return None
+
+
+def reduce_powers(quadruples, names):
+    ops = quadruples.op
+    arg1 = quadruples.arg1
+    arg2 = quadruples.arg2
+    result = quadruples.result
+    size = len(quadruples)
+    expansions = {}
+    for i in range(size):
+        op = ops[i]
+        if op not in ('*', '/', '%'):
+            continue
+        x = arg1[i]
+        k = power_of_two(arg2[i])
+        if k is None and op == '*':
+            x = arg2[i]
+            k = power_of_two(arg1[i])
+        if k is None or names.is_real(x):
+            continue
+        r = result[i]
+        if k == 0:
+            expansions[i] = [(':=', '0' if op == '%' else x, None, r)]
+        elif op == '*':
+            expansions[i] = [('<<', x, str(k), r)]
+        else:
+            mask = str((1 << k) - 1)
+            sign, bias, biased = names.new_temp(), names.new_temp(), names.new_temp()
+            code = [('>>', x, '31', sign), ('&', sign, mask, bias), ('+', x, bias, biased)]
+            if op == '/':
+                code.append(('>>', biased, str(k), r))
+            else:
+                low = names.new_temp()
+                code += [('&', biased, mask, low), ('-', low, bias, r)]
+            expansions[i] = code
+    if not expansions:
+        return quadruples
+
+    # a jump to a replaced instruction goes to the first of its expansion
+    new_index = array('l', [0]) * (size + 1)
+    count = 0
+    for i in range(size):
+        new_index[i] = count
+        count += len(expansions[i]) if i in expansions else 1
+    new_index[size] = count
+    reduced = Quadruples()
+    for i in range(size):
+        if i in expansions:
+            for op, a, b, r in expansions[i]:
+                reduced.append(op, a, b, r)
+        else:
+            t = quadruples.target[i]
+            reduced.append(ops[i], arg1[i], arg2[i], result[i],
+                           NO_TARGET if t == NO_TARGET else new_index[t])
+    return reduced
+
+
+# k when the operand is the int constant 2^k, else None
+def power_of_two(operand):
+    if not is_int_constant(operand):
+        return None
+    value = int(operand)
+    if value <= 0 or value & (value - 1):
+        return None
+    return value.bit_length() - 1
+
+
+# Temps whose values are never needed at the same time share a name, like
+# registers do: the liveness of the temps (see cfg.py) gives the temps
+# live after every instruction, a temp conflicts with the ones
+# live where it is assigned, and every temp takes the lowest slot none of
+# the temps of its type it conflicts with has, slot k being the k-th temp
+# of that type of the session (temp_int_1, temp_int_2, ... or temp_real_1,
+# ...).
+# The other passes count on the temps being assigned once: this one runs
+# last.
+def reuse_temps(quadruples, names):
+    arg1 = quadruples.arg1
+    arg2 = quadruples.arg2
+    result = quadruples.result
+    cfg = CFG(quadruples)
+    bit, live_in, live_out = liveness(quadruples, cfg, names.is_temp)
+    if not bit:
+        return quadruples
+
+    conflicts = [0] * len(bit)
+    for b in range(len(cfg)):
+        live = live_out[b]
+        for i in range(cfg.end[b] - 1, cfg.start[b] - 1, -1):
+            if names.is_temp(result[i]):
+                t = bit[result[i]]
+                live &= ~(1 << t)
+                conflicts[t] |= live
+                for other in bits(live):
+                    conflicts[other] |= 1 << t
+            if names.is_temp(arg1[i]):
+                live |= 1 << bit[arg1[i]]
+            if names.is_temp(arg2[i]):
+                live |= 1 << bit[arg2[i]]
+
+    # bit order is the order the temps first appear in
+    real = [names.is_real(name) for name in bit]
+    slots = []
+    for t in range(len(bit)):
+        taken = {slots[other] for other in bits(conflicts[t])
+                 if other < t and real[other] == real[t]}
+        slot = 0
+        while slot in taken:
+            slot += 1
+        slots.append(slot)
+    of_type = {False: [name for name in names.temps if not names.is_real(name)],
+               True: [name for name in names.temps if names.is_real(name)]}
+    renamed = {name: of_type[real[t]][slots[t]] for name, t in bit.items()}
+    for i in range(len(quadruples)):
+        if arg1[i] in renamed:
+            arg1[i] = renamed[arg1[i]]
+        if arg2[i] in renamed:
+            arg2[i] = renamed[arg2[i]]
+        if result[i] in renamed:
+            result[i] = renamed[result[i]]
+    return quadruples
+
+
+# the indexes of the bits set in an int
+def bits(mask):
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+# drops the gotos to the next instruction which is kept
+def drop_fall_throughs(quadruples, keep):
+    ops = quadruples.op
+    target = quadruples.target
+    size = len(quadruples)
+    # first instruction from i on which is kept
+    next_kept = array('l', [size]) * (size + 1)
+    for i in range(size - 1, -1, -1):
+        if (keep[i] and ops[i] == 'goto' and target[i] > i
+                and next_kept[target[i]] == next_kept[i + 1]):
+            keep[i] = 0
+        next_kept[i] = i if keep[i] else next_kept[i + 1]
+
+
+# the instructions i with keep[i], jump targets renumbered: a jump to an
+# instruction which is dropped goes to the next one which is kept
+def compact(quadruples, keep):
+    size = len(quadruples)
+    if all(keep):
+        return quadruples
+    new_index = array('l', [0]) * (size + 1)
+    count = 0
+    for i in range(size):
+        new_index[i] = count
+        if keep[i]:
+            count += 1
+    new_index[size] = count
+    compacted = Quadruples()
+    for i, (op, a, b, r, t) in enumerate(quadruples):
+        if keep[i]:
+            compacted.append(op, a, b, r, NO_TARGET if t == NO_TARGET else new_index[t])
+    return compacted
+
+
+# the temps the instructions mention, in the order they were made
+def temp_names(quadruples, names):
+    used = used_names(quadruples)
+    return [name for name in names.temps if name in used]
+
+
+# every operand and result the instructions mention
+def used_names(quadruples):
+    names = set(quadruples.arg1)
+    names.update(quadruples.arg2)
+    names.update(quadruples.result)
+    names.discard(None)
+    return names
+
+
+PASSES = {
+    'fold': fold_constants,
+    'jumps': thread_jumps,
+    'lvn': number_values,
+    'licm': hoist_invariants,
+    'strength': reduce_strength,
+    'temps': reuse_temps,
+}
+DEFAULT_PASSES = ('fold', 'lvn', 'jumps', 'licm', 'strength', 'temps')
+
+
+# names is what the passes know of the names (see Names), nothing is a
+# temp without it
+def optimize(quadruples, passes=DEFAULT_PASSES, names=None):
+    if names is None:
+        names = Names()
+    for name in passes:
+        quadruples = PASSES[name](quadruples, names)
+    return quadruples
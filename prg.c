@@ -1,21 +1,25 @@
 #include <stdio.h>
-int iid_1, iid_2, iid_3, iid_4, iid_5, iid_6, iid_7, iid_8, iid_9;
-int temp_int_1, temp_int_1;
+int v_a, v_b, v_c, v_d, v_e, v_f, v_m, v_g, v_s;
+int temp_int_1, temp_int_2;
 int main() {
-if a < b goto l4
-goto l6
-l4: if e < f goto l8
-goto l6
-l6: if 22 <> m goto l8
-goto l11
-l8: temp_int_1 = d*e;
-c = temp_int_1;
-goto l12
-l11: f = g;
-l12: l12: if 5 <> 2 goto l14
-goto _
-l14: if a > b goto _
-goto _
-s = false;
-goto l12
+if (v_a < v_b) goto l2;
+goto l4;
+l2: if (v_e < v_f) goto l6;
+goto l4;
+l4: if (22 != v_m) goto l6;
+goto l9;
+l6: temp_int_1 = v_d * v_e;
+v_c = temp_int_1;
+goto l10;
+l9: v_f = v_g;
+l10: if (5 != 2) goto l12;
+goto l19;
+l12: if (v_a > v_b) goto l16;
+goto l14;
+l14: temp_int_2 = 1;
+goto l17;
+l16: temp_int_2 = 0;
+l17: v_s = temp_int_2;
+goto l10;
+l19: ;
 }
@@ -0,0 +1,135 @@
+# Hand-written single pass scanner.  It produces the same tokens (type,
+# value, lineno, lexpos) as the PLY lexer built from the t_ rules of main.py
+# but needs no table construction and matches every token, including runs
+# of blanks, with one regular expression instead of skipping the ignored
+# characters one at a time.
+#
+# It has the interface the PLY parser uses: input(), token(), clone().
+
+import re
+
+# keywords and type names, the t_IDENTIFIER rule of main.py uses it too
+reserved = {
+    'if': 'IF', 'then': 'THEN', 'while': 'WHILE', 'else': 'ELSE', 'do': 'DO',
+    'print': 'PRINT', 'switch': 'SWITCH', 'of': 'OF', 'done': 'DONE',
+    'program': 'PROGRAM', 'var': 'VAR', 'begin': 'BEGIN', 'end': 'END',
+    'default': 'DEFAULT', 'real': 'REAL', 'int': 'INT',
+}
+
+operators = {
+    ':=': 'ASSIGN', '<=': 'LE', '>=': 'GE', '<>': 'GL', '&&': 'AND', '||': 'OR',
+    ':': 'COLON', ';': 'SEMICOLON', ',': 'COMMA', '+': 'PLUS', '-': 'MINUS',
+    '*': 'TIMES', '/': 'DIVIDE', '%': 'MOD', '<': 'LT', '>': 'GT', '=': 'EQ',
+    '(': 'LPAREN', ')': 'RPAREN', '!': 'NOT',
+}
+
+# the blanks before a token and one alternative per kind of token, so a
+# single match per token; the operators are tried longest first.  The same
+# expression is compiled for str and for bytes-like sources (mmap).
+token_pattern = (r'([ \t\n]*)(?:'
+                 r'([a-zA-Z_][a-zA-Z0-9_]*)'
+                 r'|([0-9]+\.[0-9]+)'
+                 r'|([0-9]+)'
+                 r'|(' + '|'.join(re.escape(op) for op in sorted(operators, key=len, reverse=True)) +
+                 r'))')
+token_re = re.compile(token_pattern)
+token_re_bytes = re.compile(token_pattern.encode('ascii'))
+blanks_re = re.compile(r'[ \t\n]*')
+blanks_re_bytes = re.compile(rb'[ \t\n]*')
+BLANKS, IDENTIFIER, CONSTREAL, CONSTINT, OPERATOR = 1, 2, 3, 4, 5
+
+
+class Token:
+    __slots__ = ('type', 'value', 'lineno', 'lexpos', 'column', 'lexer')
+
+    def __init__(self, type, value, lineno, lexpos, column):
+        self.type = type
+        self.value = value
+        self.lineno = lineno
+        self.lexpos = lexpos
+        self.column = column
+
+    def __repr__(self):
+        return 'LexToken(%s,%r,%d,%d)' % (self.type, self.value, self.lineno, self.lexpos)
+
+
+# Tokens are generated one at a time, so scanning keeps nothing but the
+# current position, line and line start: a memory-mapped file is scanned
+# in place without being copied into a string.
+class Scanner:
+    def __init__(self):
+        self.lexdata = ''
+        self.lexpos = 0
+        self.lineno = 1
+        self.tokens = iter(())
+
+    def clone(self):
+        return Scanner()
+
+    # text is a str, or anything supporting the buffer protocol (bytes,
+    # mmap) holding ASCII source
+    def input(self, text):
+        self.lexdata = text
+        self.lexpos = 0
+        self.lineno = 1
+        self.tokens = self.scan(text)
+
+    def token(self):
+        return next(self.tokens, None)
+
+    def __iter__(self):
+        return self.tokens
+
+    def scan(self, text):
+        if isinstance(text, str):
+            match = token_re.match
+            blanks = blanks_re.match
+            newline = '\n'
+            decode = None
+        else:
+            match = token_re_bytes.match
+            blanks = blanks_re_bytes.match
+            newline = b'\n'
+            decode = bytes.decode
+        length = len(text)
+        pos = 0
+        line_start = 0
+        while pos < length:
+            m = match(text, pos)
+            if m is None:
+                end = blanks(text, pos).end()
+                skipped = text[pos:end]
+                if newline in skipped:
+                    self.lineno += skipped.count(newline)
+                    line_start = pos + skipped.rfind(newline) + 1
+                pos = end
+                if pos < length:
+                    # like t_error of main.py: report and skip one character
+                    char = text[pos:pos + 1]
+                    if decode is not None:
+                        char = char.decode('latin-1')
+                    self.session.errors.append(
+                        f'Illegal character {char!r} '
+                        f'(line {self.lineno}, column {pos - line_start + 1})')
+                    pos += 1
+                continue
+            skipped = m.group(BLANKS)
+            if newline in skipped:
+                self.lineno += skipped.count(newline)
+                line_start = pos + skipped.rfind(newline) + 1
+            kind = m.lastindex
+            value = m.group(kind)
+            if decode is not None:
+                value = decode(value)
+            start = m.start(kind)
+            if kind == IDENTIFIER:
+                kind = reserved.get(value, 'IDENTIFIER')
+            elif kind == OPERATOR:
+                kind = operators[value]
+            elif kind == CONSTINT:
+                kind = 'CONSTINT'
+            else:
+                kind = 'CONSTREAL'
+            yield Token(kind, value, self.lineno, start, start - line_start + 1)
+            pos = m.end()
+            self.lexpos = pos
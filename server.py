@@ -0,0 +1,210 @@
+# Compile server: a long running process which keeps warm workers (with
+# the lexer and the parser already built) and compiles the programs its
+# clients send, so a compile costs milliseconds instead of an interpreter
+# start plus the table construction.
+#
+# Requests and responses are frames: a 4 byte big-endian length followed by
+# that many bytes of UTF-8 JSON.
+#
+#   request   {"id": any, "source": "program p ..."}
+#   response  {"id": any, "ok": true, "c": "#include ...", "seconds": 0.001}
+#             {"id": any, "ok": false, "errors": ["Syntax error at 'end'"]}
+#
+# Requests of one connection are compiled concurrently, responses are sent
+# as soon as they are ready (so not necessarily in order; match them by id).
+#
+#   python server.py serve [--socket PATH | --stdio] [-j N]
+#   python server.py compile [--socket PATH] FILE... [-o DIR]
+
+import argparse
+import asyncio
+import json
+import os
+import signal
+import socket
+import struct
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import batch
+import main
+
+HEADER = struct.Struct('>I')
+DEFAULT_SOCKET = os.path.join(tempfile.gettempdir(), 'compiler-%d.sock' % os.getuid())
+
+
+def encode_frame(message):
+    body = json.dumps(message).encode('utf-8')
+    return HEADER.pack(len(body)) + body
+
+
+# runs in a worker process
+def compile_request(request):
+    start = time.perf_counter()
+    response = {'id': request.get('id')}
+    try:
+        result = main.compile_source(request['source'], ast_mode='none')
+        response['ok'] = True
+        response['c'] = result.c_text()
+    except main.CompileError as e:
+        response['ok'] = False
+        response['errors'] = e.errors
+    except Exception as e:
+        response['ok'] = False
+        response['errors'] = ['%s: %s' % (type(e).__name__, e)]
+    response['seconds'] = time.perf_counter() - start
+    return response
+
+
+class CompileServer:
+    def __init__(self, workers=None):
+        self.workers = workers or os.cpu_count() or 1
+        self.executor = None
+
+    def start_workers(self):
+        self.executor = ProcessPoolExecutor(self.workers, initializer=batch.init_worker)
+        # start every worker now rather than on the first requests
+        warm_up = {'source': 'program warm begin a := 1 end'}
+        for future in [self.executor.submit(compile_request, warm_up) for i in range(self.workers)]:
+            future.result()
+
+    async def serve_request(self, request, writer):
+        loop = asyncio.get_running_loop()
+        if not isinstance(request, dict) or not isinstance(request.get('source'), str):
+            response = {'id': request.get('id') if isinstance(request, dict) else None,
+                        'ok': False, 'errors': ['request needs a "source" string']}
+        else:
+            response = await loop.run_in_executor(self.executor, compile_request, request)
+        writer.write(encode_frame(response))
+        await writer.drain()
+
+    async def handle_connection(self, reader, writer):
+        pending = set()
+        try:
+            while True:
+                try:
+                    header = await reader.readexactly(HEADER.size)
+                    body = await reader.readexactly(HEADER.unpack(header)[0])
+                except asyncio.IncompleteReadError:
+                    break
+                try:
+                    request = json.loads(body)
+                except ValueError as e:
+                    writer.write(encode_frame({'id': None, 'ok': False,
+                                               'errors': ['bad request: %s' % e]}))
+                    continue
+                task = asyncio.ensure_future(self.serve_request(request, writer))
+                pending.add(task)
+                task.add_done_callback(pending.discard)
+            if pending:
+                await asyncio.wait(pending)
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def serve_unix(self, path):
+        if os.path.exists(path):
+            os.unlink(path)
+        server = await asyncio.start_unix_server(self.handle_connection, path)
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(signum, stop.set)
+        print('serving on %s with %d workers' % (path, self.workers), file=sys.stderr)
+        try:
+            async with server:
+                await stop.wait()
+        finally:
+            os.unlink(path)
+
+    async def serve_stdio(self):
+        loop = asyncio.get_running_loop()
+        reader = asyncio.StreamReader()
+        await loop.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(reader), sys.stdin)
+        transport, protocol = await loop.connect_write_pipe(
+            asyncio.streams.FlowControlMixin, sys.stdout)
+        writer = asyncio.StreamWriter(transport, protocol, reader, loop)
+        await self.handle_connection(reader, writer)
+
+    def run(self, path=None, stdio=False):
+        self.start_workers()
+        try:
+            if stdio:
+                asyncio.run(self.serve_stdio())
+            else:
+                asyncio.run(self.serve_unix(path or DEFAULT_SOCKET))
+        finally:
+            self.executor.shutdown()
+
+
+# --- Client
+
+
+def receive_exactly(connection, size):
+    data = bytearray()
+    while len(data) < size:
+        chunk = connection.recv(size - len(data))
+        if not chunk:
+            raise ConnectionError('server closed the connection')
+        data += chunk
+    return bytes(data)
+
+
+# sends every source and returns the responses in the order of the sources
+def request_compile(sources, path=DEFAULT_SOCKET):
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as connection:
+        connection.connect(path)
+        connection.sendall(b''.join(encode_frame({'id': i, 'source': source})
+                                    for i, source in enumerate(sources)))
+        responses = [None] * len(sources)
+        for i in range(len(sources)):
+            size = HEADER.unpack(receive_exactly(connection, HEADER.size))[0]
+            response = json.loads(receive_exactly(connection, size))
+            responses[response['id']] = response
+        return responses
+
+
+def client(files, path, output_dir=None):
+    sources = []
+    for name in files:
+        with open(name) as fp:
+            sources.append(fp.read())
+    failures = 0
+    for name, response in zip(files, request_compile(sources, path)):
+        if not response['ok']:
+            failures += 1
+            print('%s: %s' % (name, '; '.join(response['errors'])), file=sys.stderr)
+        elif output_dir is None and len(files) == 1:
+            sys.stdout.write(response['c'])
+        else:
+            output = batch.output_path(name, os.path.basename(name), output_dir)
+            if output_dir is not None:
+                os.makedirs(output_dir, exist_ok=True)
+            with open(output, 'w') as fp:
+                fp.write(response['c'])
+    return failures
+
+
+if __name__ == '__main__':
+    arg_parser = argparse.ArgumentParser(description='Compile server and its client.')
+    commands = arg_parser.add_subparsers(dest='command', required=True)
+    serve = commands.add_parser('serve', help='run the server')
+    serve.add_argument('--socket', default=DEFAULT_SOCKET, help='unix socket to listen on')
+    serve.add_argument('--stdio', action='store_true',
+                       help='serve the frames of stdin on stdout instead of a socket')
+    serve.add_argument('-j', '--jobs', type=int, default=None,
+                       help='number of worker processes (default: one per core)')
+    compile_ = commands.add_parser('compile', help='compile files with a running server')
+    compile_.add_argument('files', nargs='+')
+    compile_.add_argument('--socket', default=DEFAULT_SOCKET, help='unix socket of the server')
+    compile_.add_argument('-o', '--output-dir',
+                          help='where to write the C files (default: stdout for one file, '
+                               'next to the sources for several)')
+    args = arg_parser.parse_args()
+    if args.command == 'serve':
+        CompileServer(args.jobs).run(args.socket, args.stdio)
+    else:
+        sys.exit(1 if client(args.files, args.socket, args.output_dir) else 0)
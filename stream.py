@@ -0,0 +1,151 @@
+# Streaming emission: the C text is written to the output file while the
+# parser generates the instructions, instead of being kept in Quadruples
+# and emitted at the end.
+#
+# A jump whose target is not known yet is written with a fixed-width
+# placeholder and only the file offset of the placeholder is remembered;
+# backpatch() writes the label over it.  The declarations, only known at
+# the end, go into a region reserved after the #include line.  So what is
+# kept in memory is the unresolved jumps and a write buffer, whatever the
+# size of the program.
+#
+# Every position the grammar marks as a possible target (mark()) is
+# labelled when its instruction is written: the output may have labels
+# that are never jumped to.  Targets must come from mark().
+#
+# reals is the set of the real variables and temps, which grows while the
+# program is parsed (see symbols.py): a print takes the format of its
+# operand when it is written.
+
+import os
+import tempfile
+
+from ir import JUMP_OPS, NO_TARGET, c_statement, instructions, label_name
+
+LABEL_WIDTH = 11            # 'l' and up to 10 digits
+PLACEHOLDER = label_name(NO_TARGET).ljust(LABEL_WIDTH)
+HEADER_SIZE = 64 * 1024     # bytes reserved for the declarations
+BUFFER_SIZE = 64 * 1024
+COPY_SIZE = 1024 * 1024
+
+
+class StreamingQuadruples:
+    def __init__(self, path, reals=(), header_size=HEADER_SIZE):
+        self.path = path
+        self.reals = reals
+        self.header_size = header_size
+        self.fd = os.open(path, os.O_RDWR | os.O_CREAT | os.O_TRUNC, 0o666)
+        self.buffer = bytearray()
+        # bytes already in the file, the buffer comes after them
+        self.flushed = 0
+        self.count = 0
+        # instruction which gets a label when it is written
+        self.marked = NO_TARGET
+        # unresolved jump -> file offset of its placeholder
+        self.unresolved = {}
+        self.write('#include <stdio.h>\n')
+        self.header = self.size()
+        self.write(' ' * (header_size - 1) + '\n')
+        self.write('int main() {\n')
+
+    def __len__(self):
+        return self.count
+
+    def nextinstr(self):
+        return self.count
+
+    def mark(self):
+        self.marked = self.count
+        return self.count
+
+    def append(self, op, arg1=None, arg2=None, result=None, target=NO_TARGET):
+        line = ''
+        if self.marked == self.count:
+            line = label_name(self.count) + ': '
+        if op in JUMP_OPS and target == NO_TARGET:
+            line += c_statement(op, arg1, arg2, result, PLACEHOLDER, self.reals)
+            self.unresolved[self.count] = self.size() + line.rindex(PLACEHOLDER)
+        else:
+            line += c_statement(op, arg1, arg2, result, label_name(target), self.reals)
+        self.write(line + '\n')
+        self.count += 1
+        return self.count - 1
+
+    def backpatch(self, plist, label):
+        data = label_name(label).ljust(LABEL_WIDTH).encode('ascii')
+        for i in instructions(plist):
+            self.write_at(self.unresolved.pop(i), data)
+
+    def size(self):
+        return self.flushed + len(self.buffer)
+
+    def write(self, text):
+        self.buffer += text.encode('ascii')
+        if len(self.buffer) >= BUFFER_SIZE:
+            self.flush()
+
+    def flush(self):
+        write_all(self.fd, self.buffer)
+        self.flushed += len(self.buffer)
+        self.buffer.clear()
+
+    # patches the buffer if the offset is still there, the file otherwise
+    def write_at(self, offset, data):
+        if offset >= self.flushed:
+            start = offset - self.flushed
+            self.buffer[start:start + len(data)] = data
+        else:
+            os.pwrite(self.fd, data, offset)
+
+    # writes the end of the program and the declarations (a list of lines)
+    def finish(self, declarations):
+        if self.marked == self.count:
+            self.write(label_name(self.count) + ': ;\n')
+        self.write('}\n')
+        self.flush()
+        header = ''.join(line + '\n' for line in declarations).encode('ascii')
+        try:
+            if len(header) < self.header_size:
+                padding = b' ' * (self.header_size - 1 - len(header)) + b'\n'
+                os.pwrite(self.fd, header + padding, self.header)
+            else:
+                self.relocate(header)
+        finally:
+            os.close(self.fd)
+            self.fd = None
+
+    # the declarations do not fit in the reserved region: copy the file
+    # with a bigger one, a chunk at a time
+    def relocate(self, header):
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, temp_path = tempfile.mkstemp(dir=directory)
+        try:
+            try:
+                write_all(fd, os.pread(self.fd, self.header, 0) + header)
+                offset = self.header + self.header_size
+                while True:
+                    chunk = os.pread(self.fd, COPY_SIZE, offset)
+                    if not chunk:
+                        break
+                    offset += len(chunk)
+                    write_all(fd, chunk)
+                os.fchmod(fd, os.fstat(self.fd).st_mode & 0o777)
+            finally:
+                os.close(fd)
+            os.replace(temp_path, self.path)
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+
+    # removes the partial output of a failed compile
+    def abort(self):
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+        os.unlink(self.path)
+
+
+def write_all(fd, data):
+    written = os.write(fd, data)
+    while written < len(data):
+        written += os.write(fd, data[written:])
@@ -0,0 +1,59 @@
+# Symbol table of a program: its declared variables, numbered in the order
+# they are declared.  A name is interned when it is declared and every use
+# of it resolves to its C name and its number with one dict lookup, so the
+# table grows with the variables, not with their uses.
+#
+# The C name of a variable is its name with a prefix: the instructions and
+# the C text use it, so a variable can be called like a temp of the
+# compiler, a C keyword or a function of the C library.
+
+import sys
+
+# the C type of every type of the language, in the order they are declared
+C_TYPES = {'int': 'int', 'real': 'float'}
+
+C_PREFIX = 'v_'
+
+
+class SymbolTable:
+    __slots__ = ('ids', 'names', 'c_names', 'types', 'reals')
+
+    def __init__(self):
+        self.ids = {}      # name -> id
+        self.names = []    # id -> name
+        self.c_names = []  # id -> C name
+        self.types = []    # id -> type
+        self.reals = set() # the C names of the real variables and temps
+
+    def __len__(self):
+        return len(self.names)
+
+    def __contains__(self, name):
+        return name in self.ids
+
+    # adds a variable and returns its id, or None when it is already declared
+    def declare(self, name, type):
+        if name in self.ids:
+            return None
+        name = sys.intern(name)
+        c_name = sys.intern(C_PREFIX + name)
+        id = self.ids[name] = len(self.names)
+        self.names.append(name)
+        self.c_names.append(c_name)
+        self.types.append(type)
+        if type == 'real':
+            self.reals.add(c_name)
+        return id
+
+    # the id of a name, or None when it is not declared
+    def lookup(self, name):
+        return self.ids.get(name)
+
+    # one C declaration per type, every variable once
+    def c_declarations(self):
+        lines = []
+        for type, c_type in C_TYPES.items():
+            names = [name for name, t in zip(self.c_names, self.types) if t == type]
+            if names:
+                lines.append('%s %s;' % (c_type, ', '.join(names)))
+        return lines
@@ -0,0 +1,344 @@
+# Runs one program over many inputs at once with NumPy (which only this
+# module needs): every variable and temp is an array with one lane per
+# input, an arithmetic instruction is one array operation and a jump
+# chooses the next basic block (see cfg.py) of every lane.
+#
+# The lanes do not take the same path, so every lane has its own block
+# and a step runs the lowest numbered block any lane is waiting at, for
+# the lanes waiting there.  A lane jumping back to the head of a loop
+# waits as if it were at the last block jumping there, until the other
+# lanes in the loop get there too: the lanes of a loop start every round
+# together, and the lanes which left it wait after it for the ones still
+# going around.  Inside a block the lanes it runs for are gathered once
+# per name and their results scattered back at its end; when every lane
+# is there the arrays are used as they are.
+#
+# The values are the ones of vm.py, which is the reference: int64 lanes
+# for the ints, and for the reals float64 lanes holding values rounded to
+# a C float.  print keeps the values, their format and the lanes printing
+# them, and run() returns the text every lane printed.
+
+import numpy
+
+from cfg import CFG
+from ir import NO_TARGET, RELATIONAL_OPS, is_constant
+from vm import ExecutionError, constant_value, variable_slots
+
+
+def nonzero(divisor):
+    if type(divisor) is numpy.ndarray:
+        if not divisor.all():
+            raise ZeroDivisionError
+    elif divisor == 0:
+        raise ZeroDivisionError
+
+
+# fmod is the remainder of C, towards zero, and takes out what makes the
+# quotient exact
+def divide(a, b):
+    nonzero(b)
+    return (a - numpy.fmod(a, b)) // b
+
+
+def remainder(a, b):
+    nonzero(b)
+    return numpy.fmod(a, b)
+
+
+def real_divide(a, b):
+    nonzero(b)
+    return numpy.true_divide(a, b)
+
+
+def copy(a, b):
+    return a
+
+
+OPERATIONS = {
+    '+': numpy.add, '-': numpy.subtract, '*': numpy.multiply,
+    '/': divide, '%': remainder,
+    '<<': numpy.left_shift, '>>': numpy.right_shift, '&': numpy.bitwise_and,
+    'neg': lambda a, b: numpy.negative(a),
+    ':=': copy,
+}
+
+# the operations of an instruction with a real operand or result
+REAL_OPERATIONS = dict(OPERATIONS, **{'/': real_divide})
+for op in ('%', '<<', '>>', '&'):
+    del REAL_OPERATIONS[op]
+
+RELATIONS = {'<': numpy.less, '<=': numpy.less_equal, '>': numpy.greater,
+             '>=': numpy.greater_equal, '=': numpy.equal, '<>': numpy.not_equal}
+
+# how a block ends
+FALL, GOTO, BRANCH, SWITCH = range(4)
+
+
+def as_real(value):
+    return numpy.asarray(value, dtype=numpy.float32).astype(numpy.float64)
+
+
+def as_int(value):
+    return numpy.asarray(value).astype(numpy.int64)
+
+
+class Block:
+    __slots__ = ('size', 'code', 'end', 'relation', 'a', 'b', 'target', 'following',
+                 'keys', 'targets')
+
+    def __init__(self):
+        # the instructions run
+        self.size = 0
+        # (operation, a, b, r, store) of the instructions before the jump,
+        # store converting the result for a real instruction; a print is
+        # (None, a, None, None, format)
+        self.code = []
+        self.end = FALL
+        self.relation = None
+        self.a = self.b = None
+        # blocks: where the jump goes, where the block falls through
+        self.target = self.following = None
+        # the case constants of a switch, sorted, and their blocks
+        self.keys = self.targets = None
+
+
+class VectorProgram:
+    __slots__ = ('blocks', 'latch', 'initial', 'reals', 'names', 'steps', 'executed')
+
+    def __init__(self):
+        self.blocks = []
+        # block -> the last block jumping back to it (itself when none does)
+        self.latch = None
+        # slot -> the value of a constant, None for a name
+        self.initial = []
+        # slot -> whether it holds a real
+        self.reals = []
+        # variable (its name in the program) -> slot
+        self.names = {}
+        # blocks run by the last run(), and instructions run, once per lane
+        self.steps = 0
+        self.executed = 0
+
+    # Runs the program for `lanes` inputs, inputs being name -> the value
+    # of the variable in every lane (a sequence, or one value for all of
+    # them), the other variables starting at 0.  Returns what every lane
+    # printed.  Running more than `limit` blocks is an error.
+    def run(self, inputs=None, lanes=None, limit=None):
+        inputs = inputs or {}
+        if lanes is None:
+            lanes = max((numpy.size(value) for value in inputs.values()), default=1)
+        values = []
+        for value, real in zip(self.initial, self.reals):
+            if value is None:
+                values.append(numpy.zeros(lanes, numpy.float64 if real else numpy.int64))
+            else:
+                values.append(value)
+        for name, value in inputs.items():
+            if name not in self.names:
+                raise ValueError('unknown variable %r' % name)
+            s = self.names[name]
+            value = as_real(value) if self.reals[s] else as_int(value)
+            values[s] = numpy.array(numpy.broadcast_to(value, (lanes,)))
+        printed = []
+        # the block of every lane, and when it runs: 2 * block, or
+        # 2 * latch + 1 after jumping back to the head of a loop
+        pc = numpy.zeros(lanes, numpy.int64)
+        wait = numpy.zeros(lanes, numpy.int64)
+        latch = self.latch
+        end = len(self.blocks)
+        self.steps = self.executed = 0
+        while lanes:
+            first = int(wait.min())
+            if first == 2 * end:
+                break
+            if first % 2:
+                # every lane of the loop is back at its head
+                back = wait == first
+                wait[back] = 2 * pc[back]
+                continue
+            b = first // 2
+            if self.steps == limit:
+                raise ExecutionError('more than %d blocks run' % limit)
+            here = numpy.flatnonzero(wait == first)
+            if len(here) == lanes:
+                here = None
+            try:
+                following = self.execute(self.blocks[b], values, here, lanes, printed)
+            except ZeroDivisionError:
+                raise ExecutionError('division by zero in block %d' % b) from None
+            if type(following) is int:
+                after = 2 * following if following > b else 2 * int(latch[following]) + 1
+            else:
+                after = numpy.where(following > b, 2 * following, 2 * latch[following] + 1)
+            if here is None:
+                pc[:] = following
+                wait[:] = after
+            else:
+                pc[here] = following
+                wait[here] = after
+            self.steps += 1
+            self.executed += self.blocks[b].size * (lanes if here is None else len(here))
+        return outputs(printed, lanes)
+
+    # runs block for the lanes `here` (None for all) and returns their
+    # next blocks
+    def execute(self, block, values, here, lanes, printed):
+        local = {}
+        written = set()
+
+        def read(s):
+            if s in local:
+                return local[s]
+            value = values[s]
+            if here is not None and type(value) is numpy.ndarray:
+                value = value[here]
+            local[s] = value
+            return value
+
+        for operation, a, b, r, store in block.code:
+            if r is None:
+                # print, store is the format
+                value = read(a)
+                printed.append((here, numpy.array(value), store))
+                continue
+            value = operation(read(a), None if b is None else read(b))
+            if store is not None:
+                value = store(value)
+            elif operation is copy and here is None and type(value) is numpy.ndarray:
+                # the arrays of two names are never the same one
+                value = value.copy()
+            written.add(r)
+            local[r] = value
+        for r in written:
+            value = local[r]
+            if here is not None:
+                values[r][here] = value
+            elif numpy.ndim(value) == 0:
+                values[r] = numpy.full(lanes, value,
+                                       numpy.float64 if self.reals[r] else numpy.int64)
+            else:
+                values[r] = value
+        if block.end == FALL:
+            return block.following
+        if block.end == GOTO:
+            return block.target
+        if block.end == BRANCH:
+            taken = block.relation(read(block.a), read(block.b))
+            return numpy.where(taken, block.target, block.following)
+        value = numpy.asarray(read(block.a))
+        keys = block.keys
+        position = numpy.minimum(numpy.searchsorted(keys, value), len(keys) - 1)
+        return numpy.where(keys[position] == value, block.targets[position], block.target)
+
+
+# the text every lane printed, from the values printed by the blocks
+def outputs(printed, lanes):
+    lines = [[] for lane in range(lanes)]
+    for here, value, format in printed:
+        if here is None:
+            for lane, x in enumerate(numpy.broadcast_to(value, (lanes,)).tolist()):
+                lines[lane].append(format % x)
+        else:
+            for lane, x in zip(here.tolist(), numpy.broadcast_to(value, here.shape).tolist()):
+                lines[lane].append(format % x)
+    return [''.join(text) for text in lines]
+
+
+# the VectorProgram of quadruples whose variables are declared in symbols
+# (see symbols.py), which gives their C names and the real variables and
+# temps; the other names are ints
+def load(quadruples, symbols=None):
+    program = VectorProgram()
+    slot_of = {}
+    real_temps = symbols.reals if symbols is not None else ()
+    if symbols is not None:
+        for name, declared in zip(symbols.c_names, symbols.types):
+            slot_of[name] = len(program.initial)
+            program.initial.append(None)
+            program.reals.append(declared == 'real')
+
+    def slot(operand):
+        if operand is None:
+            return None
+        if operand not in slot_of:
+            slot_of[operand] = len(program.initial)
+            if is_constant(operand):
+                value = constant_value(operand)
+                program.initial.append(value)
+                program.reals.append(type(value) is float)
+            else:
+                program.initial.append(None)
+                program.reals.append(operand in real_temps)
+        return slot_of[operand]
+
+    ops = quadruples.op
+    arg1 = quadruples.arg1
+    arg2 = quadruples.arg2
+    result = quadruples.result
+    targets = quadruples.target
+    cfg = CFG(quadruples)
+    block_of = cfg.block_of
+    reals = program.reals
+    value = None
+    for start, end in zip(cfg.start, cfg.end):
+        block = Block()
+        block.following = block_of[end]
+        for i in range(start, end):
+            block.size += 1
+            op = ops[i]
+            a = slot(arg1[i])
+            b = slot(arg2[i])
+            r = slot(result[i])
+            if op in RELATIONAL_OPS or op in ('goto', 'case', 'default'):
+                if targets[i] == NO_TARGET:
+                    raise ValueError('jump %d has no target' % i)
+                block.target = block_of[targets[i]]
+                if op == 'goto' or op == 'default':
+                    block.end = GOTO
+                elif op == 'case':
+                    # tests the value of its switch
+                    block.end = BRANCH
+                    block.relation = numpy.equal
+                    block.a, block.b = value, a
+                else:
+                    block.end = BRANCH
+                    block.relation = RELATIONS[op]
+                    block.a, block.b = a, b
+            elif op == 'switch':
+                # the jump table: the case and default instructions after it
+                value = a
+                cases = {}
+                j = i + 1
+                while ops[j] == 'case':
+                    cases.setdefault(constant_value(arg1[j]), block_of[targets[j]])
+                    j += 1
+                block.end = SWITCH
+                block.a = a
+                block.keys = numpy.array(sorted(cases), numpy.int64)
+                block.targets = numpy.array([cases[k] for k in sorted(cases)], numpy.int64)
+                block.target = block_of[targets[j]]
+                # the case instructions after it only run when jumped to
+                break
+            elif op == 'print':
+                block.code.append((None, a, None, None, '%f\n' if reals[a] else '%d\n'))
+            elif op in OPERATIONS:
+                real = reals[a] or (b is not None and reals[b]) or reals[r]
+                if not real:
+                    block.code.append((OPERATIONS[op], a, b, r, None))
+                elif op in REAL_OPERATIONS:
+                    block.code.append((REAL_OPERATIONS[op], a, b, r,
+                                       as_real if reals[r] else as_int))
+                else:
+                    # C has no % << >> & of floats either
+                    raise ValueError('%s of a real in instruction %d' % (op, i))
+            else:
+                raise ValueError('unknown operation %r' % op)
+        program.blocks.append(block)
+    latch = numpy.arange(len(cfg) + 1, dtype=numpy.int64)
+    for b in range(len(cfg)):
+        for s in cfg.successors[b]:
+            if s <= b:
+                latch[s] = max(latch[s], b)
+    program.latch = latch
+    program.names = variable_slots(slot_of, symbols)
+    return program
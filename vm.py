@@ -0,0 +1,373 @@
+# In-process execution of the quadruples of ir.py, without going through C.
+#
+# load() turns the quadruples into a Program.  Every operand becomes the
+# index of a slot of one flat list (the variables, the temps and the
+# constants, which are slots holding their value), every jump target an
+# int, and every instruction a closure made by the entry of HANDLERS for
+# its operation.  The closure does the work of its instruction and returns
+# the next one, so running the program is
+#
+#     while pc < end:
+#         pc = steps[pc]()
+#
+# The values follow C.  Int division and remainder truncate towards zero.
+# An instruction with a real operand or result computes in floating point
+# and stores into an int slot truncated, into a real one (a C float)
+# rounded to single precision.  Int overflow is undefined in C and not
+# emulated: the values are Python ints.  print writes the lines printf
+# would to the output of the run, %d of an int and %f of a real.
+
+import struct
+
+from ir import ARITHMETIC_OPS, JUMP_OPS, NO_TARGET, is_constant
+
+FLOAT = struct.Struct('f')
+
+
+class ExecutionError(Exception):
+    pass
+
+
+# the quotient of C ints
+def divide(a, b):
+    q = a // b
+    if q < 0 and q * b != a:
+        q += 1
+    return q
+
+
+def remainder(a, b):
+    return a - b * divide(a, b)
+
+
+# a double rounded to a C float
+def single(value):
+    return FLOAT.unpack(FLOAT.pack(value))[0]
+
+
+# Every handler takes (slots, output, a, b, r, target, following): the
+# slot list, the output lines, the slots of arg1, arg2 and result, the
+# jump target and the next instruction, and returns the closure of one
+# instruction.
+
+def add(slots, output, a, b, r, target, following):
+    def step():
+        slots[r] = slots[a] + slots[b]
+        return following
+    return step
+
+
+def subtract(slots, output, a, b, r, target, following):
+    def step():
+        slots[r] = slots[a] - slots[b]
+        return following
+    return step
+
+
+def multiply(slots, output, a, b, r, target, following):
+    def step():
+        slots[r] = slots[a] * slots[b]
+        return following
+    return step
+
+
+def quotient(slots, output, a, b, r, target, following):
+    def step():
+        slots[r] = divide(slots[a], slots[b])
+        return following
+    return step
+
+
+def modulo(slots, output, a, b, r, target, following):
+    def step():
+        slots[r] = remainder(slots[a], slots[b])
+        return following
+    return step
+
+
+def shift_left(slots, output, a, b, r, target, following):
+    def step():
+        slots[r] = slots[a] << slots[b]
+        return following
+    return step
+
+
+def shift_right(slots, output, a, b, r, target, following):
+    def step():
+        slots[r] = slots[a] >> slots[b]
+        return following
+    return step
+
+
+def bitwise_and(slots, output, a, b, r, target, following):
+    def step():
+        slots[r] = slots[a] & slots[b]
+        return following
+    return step
+
+
+def negate(slots, output, a, b, r, target, following):
+    def step():
+        slots[r] = -slots[a]
+        return following
+    return step
+
+
+def copy(slots, output, a, b, r, target, following):
+    def step():
+        slots[r] = slots[a]
+        return following
+    return step
+
+
+def less(slots, output, a, b, r, target, following):
+    def step():
+        return target if slots[a] < slots[b] else following
+    return step
+
+
+def less_equal(slots, output, a, b, r, target, following):
+    def step():
+        return target if slots[a] <= slots[b] else following
+    return step
+
+
+def greater(slots, output, a, b, r, target, following):
+    def step():
+        return target if slots[a] > slots[b] else following
+    return step
+
+
+def greater_equal(slots, output, a, b, r, target, following):
+    def step():
+        return target if slots[a] >= slots[b] else following
+    return step
+
+
+def equal(slots, output, a, b, r, target, following):
+    def step():
+        return target if slots[a] == slots[b] else following
+    return step
+
+
+def not_equal(slots, output, a, b, r, target, following):
+    def step():
+        return target if slots[a] != slots[b] else following
+    return step
+
+
+def goto(slots, output, a, b, r, target, following):
+    def step():
+        return target
+    return step
+
+
+def print_(slots, output, a, b, r, target, following):
+    def step():
+        output.append('%d\n' % slots[a])
+        return following
+    return step
+
+
+def print_real(slots, output, a, b, r, target, following):
+    def step():
+        output.append('%f\n' % slots[a])
+        return following
+    return step
+
+
+HANDLERS = {
+    '+': add, '-': subtract, '*': multiply, '/': quotient, '%': modulo,
+    '<<': shift_left, '>>': shift_right, '&': bitwise_and,
+    'neg': negate, ':=': copy,
+    '<': less, '<=': less_equal, '>': greater, '>=': greater_equal,
+    '=': equal, '<>': not_equal,
+    'goto': goto, 'default': goto,
+    'print': print_,
+}
+
+# the operations of an instruction with a real operand or result
+REAL_OPERATIONS = {
+    '+': lambda x, y: x + y,
+    '-': lambda x, y: x - y,
+    '*': lambda x, y: x * y,
+    '/': lambda x, y: x / y,
+    'neg': lambda x, y: -x,
+    ':=': lambda x, y: x,
+}
+
+
+def real(operation, slots, a, b, r, real_result, following):
+    if real_result:
+        def step():
+            slots[r] = single(operation(slots[a], slots[b]))
+            return following
+    else:
+        def step():
+            slots[r] = int(operation(slots[a], slots[b]))
+            return following
+    return step
+
+
+# The jump table of a switch: its cases and default follow it.  A jump
+# into the table (the passes never make one) still finds case instructions
+# testing the value of the switch.
+def switch(slots, value, cases, otherwise):
+    get = cases.get
+
+    def step():
+        return get(slots[value], otherwise)
+    return step
+
+
+def case(slots, value, k, target, following):
+    def step():
+        return target if slots[value] == slots[k] else following
+    return step
+
+
+class Program:
+    __slots__ = ('steps', 'slots', 'initial', 'names', 'output', 'executed')
+
+    def __init__(self):
+        self.steps = []
+        self.slots = []
+        self.initial = []
+        # variable (its name in the program) -> slot
+        self.names = {}
+        self.output = []
+        # instructions run by the last run()
+        self.executed = 0
+
+    def __len__(self):
+        return len(self.steps)
+
+    # runs the program from its first instruction with every variable 0,
+    # or the value given in inputs (name -> value), and returns what it
+    # printed; more than `limit` instructions is an error
+    def run(self, limit=None, inputs=None):
+        steps = self.steps
+        end = len(steps)
+        slots = self.slots
+        slots[:] = self.initial
+        if inputs:
+            for name, value in inputs.items():
+                if name not in self.names:
+                    raise ValueError('unknown variable %r' % name)
+                s = self.names[name]
+                slots[s] = single(value) if type(slots[s]) is float else int(value)
+        del self.output[:]
+        pc = 0
+        executed = 0
+        try:
+            if limit is None:
+                while pc < end:
+                    pc = steps[pc]()
+                    executed += 1
+            else:
+                while pc < end:
+                    if executed == limit:
+                        raise ExecutionError('more than %d instructions run' % limit)
+                    pc = steps[pc]()
+                    executed += 1
+        except ZeroDivisionError:
+            raise ExecutionError('division by zero in instruction %d' % pc) from None
+        finally:
+            self.executed = executed
+        return ''.join(self.output)
+
+
+# the value of a constant operand ('5', '-2', '3.14')
+def constant_value(text):
+    try:
+        return int(text)
+    except ValueError:
+        return float(text)
+
+
+# the Program of quadruples whose variables are declared in symbols (see
+# symbols.py), which gives their C names and the real variables and temps;
+# the other names are ints
+def load(quadruples, symbols=None):
+    program = Program()
+    slots = program.initial
+    runtime = program.slots
+    output = program.output
+    slot_of = {}
+    reals = set()
+    real_temps = symbols.reals if symbols is not None else ()
+    if symbols is not None:
+        for name, declared in zip(symbols.c_names, symbols.types):
+            slot_of[name] = len(slots)
+            if declared == 'real':
+                slots.append(0.0)
+                reals.add(name)
+            else:
+                slots.append(0)
+
+    def slot(operand):
+        if operand is None:
+            return None
+        if operand not in slot_of:
+            slot_of[operand] = len(slots)
+            if is_constant(operand):
+                value = constant_value(operand)
+                if type(value) is float:
+                    reals.add(operand)
+                slots.append(value)
+            elif operand in real_temps:
+                reals.add(operand)
+                slots.append(0.0)
+            else:
+                slots.append(0)
+        return slot_of[operand]
+
+    ops = quadruples.op
+    arg1 = quadruples.arg1
+    arg2 = quadruples.arg2
+    result = quadruples.result
+    targets = quadruples.target
+    steps = program.steps
+    value = None
+    for i in range(len(quadruples)):
+        op = ops[i]
+        a = slot(arg1[i])
+        b = slot(arg2[i])
+        r = slot(result[i])
+        target = targets[i]
+        real_operands = arg1[i] in reals or arg2[i] in reals
+        if op in JUMP_OPS and target == NO_TARGET:
+            raise ValueError('jump %d has no target' % i)
+        if op == 'switch':
+            value = a
+            cases = {}
+            j = i + 1
+            while ops[j] == 'case':
+                cases.setdefault(constant_value(arg1[j]), targets[j])
+                j += 1
+            steps.append(switch(runtime, a, cases, targets[j]))
+        elif op == 'case':
+            steps.append(case(runtime, value, a, target, i + 1))
+        elif op == 'print' and arg1[i] in reals:
+            steps.append(print_real(runtime, output, a, b, r, target, i + 1))
+        elif op in REAL_OPERATIONS and (real_operands or result[i] in reals):
+            steps.append(real(REAL_OPERATIONS[op], runtime, a, a if b is None else b, r,
+                              result[i] in reals, i + 1))
+        elif op in ARITHMETIC_OPS and real_operands:
+            # C has no % << >> & of floats either
+            raise ValueError('%s of a real in instruction %d' % (op, i))
+        elif op in HANDLERS:
+            steps.append(HANDLERS[op](runtime, output, a, b, r, target, i + 1))
+        else:
+            raise ValueError('unknown operation %r' % op)
+    runtime[:] = slots
+    program.names = variable_slots(slot_of, symbols)
+    return program
+
+
+# name -> slot of the variables: the declared ones by their name in the
+# program, without symbols every name which is not a constant
+def variable_slots(slot_of, symbols):
+    if symbols is not None:
+        return {name: slot_of[c_name] for name, c_name in zip(symbols.names, symbols.c_names)}
+    return {name: s for name, s in slot_of.items() if not is_constant(name)}